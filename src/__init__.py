@@ -0,0 +1,32 @@
+"""LowFake: decoder and encoder for Lowrance SL2/SLG/SL3 sonar recordings and the Deeper GPS/sonar pipeline.
+
+Importing the package does no I/O and imports neither NumPy nor YAML, the classes below are loaded on first access.
+"""
+import importlib
+
+_EXPORTS = {
+    "SL2Decoder": ".sl2ToCsv.lowranceToHumanReadable",
+    "DecoderInstrumentation": ".sl2ToCsv.lowranceToHumanReadable",
+    "PerfInstrumentation": ".sl2ToCsv.lowranceToHumanReadable",
+    "EchogramRenderer": ".sl2ToCsv.echogramTiles",
+    "SL2DecodeCache": ".sl2ToCsv.decodeCache",
+    "SonarArchive": ".sl2ToCsv.sonarArchive",
+    "SonarServer": ".sl2ToCsv.sonarServer",
+    "SpatialIndex": ".sl2ToCsv.spatialIndex",
+    "SL2Encoder": ".csvToSl2.onlyLowranceCsvToSl2",
+    "generate_sl2": ".benchmarks.syntheticSl2",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
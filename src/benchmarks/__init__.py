@@ -0,0 +1 @@
+"""Synthetic SL2 files and the decoder/encoder benchmark."""
@@ -0,0 +1,245 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from ..csvToSl2.onlyLowranceCsvToSl2 import SL2Encoder
+from ..sl2ToCsv.lowranceToHumanReadable import SL2Decoder, _peak_memory_bytes
+from .syntheticSl2 import format_size, generate_sl2, parse_channel_mix, parse_size
+
+DEFAULT_SCALES = ["10MB"]
+ALL_SCALES = ["10MB", "1GB", "10GB"]
+CASES = ["decode", "decode_parallel", "decode_columns", "save_to_csv", "clean_csv", "encode"]
+
+# Approximate peak memory per input byte of the cases that hold the whole file in memory (measured at 10MB),
+# scales that would not fit into the physical memory are skipped unless --force is given. save_to_csv streams.
+MEMORY_FACTORS = {"decode": 14, "decode_parallel": 2, "decode_columns": 2, "clean_csv": 28, "encode": 28}
+
+
+def _counted(records, counter):
+    for record in records:
+        counter[0] += 1
+        yield record
+
+
+def run_case(args):
+    """Worker: runs one benchmark case in a fresh process, so peak memory belongs to this case only."""
+    case, paths, config_path = args
+    decoder = SL2Decoder(paths["sl2"], config_path, verbose=False)
+    frames = None
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if case == "decode":
+            decoder.decode()
+            frames = len(decoder.records)
+        elif case == "decode_parallel":
+            decoder.decode_parallel()
+            frames = len(decoder.records)
+        elif case == "decode_columns":
+            decoder.decode_columns()
+            frames = len(decoder.records)
+        elif case == "save_to_csv":
+            counter = [0]
+            decoder.save_to_csv(paths["raw_csv"], _counted(decoder.iter_records(), counter))
+            frames = counter[0]
+        elif case == "clean_csv":
+            decoder.clean_csv(paths["raw_csv"], paths["clean_csv"])
+        elif case == "encode":
+            encoder = SL2Encoder(paths["clean_csv"], paths["encoded_sl2"])
+            encoder.load_csv()
+            encoder.encode()
+            frames = len(encoder.records)
+    seconds = time.perf_counter() - started
+
+    return {"seconds": round(seconds, 6), "frames": frames, "peak_memory_bytes": _peak_memory_bytes()}
+
+
+def _case_input(case, paths):
+    return paths["sl2"] if case in ("decode", "decode_parallel", "decode_columns", "save_to_csv") else paths["raw_csv"] if case == "clean_csv" else paths["clean_csv"]
+
+
+def _physical_memory():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scales, cases, work_dir, config_path=None, channel_mix=None, seed=0, force=False, keep_files=False):
+    """Generates a synthetic file per scale and runs the cases on it, returns the result rows."""
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    physical_memory = _physical_memory()
+    mix_label = "" if channel_mix is None else "_ch" + "-".join(f"{channel}x{share:g}" for channel, share in sorted(channel_mix.items()))
+    context = multiprocessing.get_context("spawn")  # fresh interpreter per case, the peak memory is not inherited
+    results = []
+
+    for scale in scales:
+        size = parse_size(scale)
+        label = format_size(size)
+        stem = f"synthetic_{label}{mix_label}_seed{seed}"
+        paths = {
+            "sl2": work_dir / f"{stem}.sl2",
+            "raw_csv": work_dir / f"{stem}_raw.csv",
+            "clean_csv": work_dir / f"{stem}.csv",
+            "encoded_sl2": work_dir / f"{stem}_encoded.sl2",
+        }
+        if not paths["sl2"].exists():  # deterministic, so an existing file is the same one
+            print(f"Generating {paths['sl2']} ...")
+            generate_sl2(paths["sl2"], size_bytes=size, channel_mix=channel_mix, seed=seed)
+
+        for case in cases:
+            input_path = _case_input(case, paths)
+            row = {"scale": label, "case": case, "input_bytes": None, "frames": None, "seconds": None,
+                   "mb_per_s": None, "frames_per_s": None, "peak_memory_bytes": None, "skipped": None, "error": None}
+            if not input_path.exists():
+                row["skipped"] = f"{input_path.name} missing (run save_to_csv/clean_csv first)"
+            else:
+                row["input_bytes"] = input_path.stat().st_size
+                needed = MEMORY_FACTORS.get(case, 0) * row["input_bytes"]
+                if not force and physical_memory and needed > physical_memory:
+                    row["skipped"] = f"needs about {needed / 1024 ** 3:.0f} GB memory (--force to run anyway)"
+            if row["skipped"] is None:
+                try:
+                    config = None if config_path is None else str(config_path)
+                    # not a Pool worker: those are daemonic and decode_parallel could not start its own pool
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        row.update(executor.submit(run_case, (case, {k: str(v) for k, v in paths.items()}, config)).result())
+                except Exception as e:
+                    row["error"] = f"{type(e).__name__}: {e}"
+                    results.append(row)
+                    _print_row(row)
+                    continue
+                row["mb_per_s"] = round(row["input_bytes"] / 1024 ** 2 / row["seconds"], 2) if row["seconds"] else None
+                if row["frames"] is not None and row["seconds"]:
+                    row["frames_per_s"] = round(row["frames"] / row["seconds"], 1)
+            results.append(row)
+            _print_row(row)
+
+        if not keep_files:
+            for name in ("raw_csv", "clean_csv", "encoded_sl2"):
+                paths[name].unlink(missing_ok=True)
+    return results
+
+
+def _print_row(row):
+    if row["skipped"] or row["error"]:
+        status = f"skipped: {row['skipped']}" if row["skipped"] else f"error: {row['error']}"
+        print(f"{row['scale']:>6} {row['case']:<15} {status}")
+        return
+    memory = f"{row['peak_memory_bytes'] / 1024 ** 2:.0f} MB" if row["peak_memory_bytes"] else "n/a"
+    frames = f"{row['frames_per_s']} frames/s" if row["frames_per_s"] else ""
+    print(f"{row['scale']:>6} {row['case']:<15} {row['seconds']:>10.3f} s {row['mb_per_s']:>9} MB/s  peak {memory:>8}  {frames}")
+
+
+def compare_results(results, baseline, tolerance=0.2):
+    """Compares throughput and peak memory with a previous result file, returns the list of regressions."""
+    previous = {(row["scale"], row["case"]): row for row in baseline["results"] if row.get("mb_per_s")}
+    regressions = []
+    for row in results:
+        old = previous.get((row["scale"], row["case"]))
+        if not row["mb_per_s"] or old is None:
+            continue
+        speed = row["mb_per_s"] / old["mb_per_s"]
+        memory = row["peak_memory_bytes"] / old["peak_memory_bytes"] if old["peak_memory_bytes"] and row["peak_memory_bytes"] else None
+        notes = []
+        if speed < 1 - tolerance:
+            notes.append(f"throughput {speed:.2f}x")
+        if memory is not None and memory > 1 + tolerance:
+            notes.append(f"peak memory {memory:.2f}x")
+        status = "REGRESSION " + ", ".join(notes) if notes else "ok"
+        memory_text = "n/a" if memory is None else f"{memory:.2f}x"
+        print(f"{row['scale']:>6} {row['case']:<15} throughput {speed:.2f}x, peak memory {memory_text}  {status}")
+        if notes:
+            regressions.append({"scale": row["scale"], "case": row["case"], "notes": notes})
+    return regressions
+
+
+def _latest_result(results_dir, seed, channel_mix):
+    """Newest result file of a run on the same synthetic files (seed and channel mix)."""
+    channel_mix = None if channel_mix is None else {str(channel): share for channel, share in channel_mix.items()}
+    for path in sorted(Path(results_dir).glob("benchmark_*.json"), reverse=True):
+        with open(path, 'r') as f:
+            report = json.load(f)
+        if report.get("seed") == seed and report.get("channel_mix") == channel_mix:
+            return path
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput and memory benchmark of decoder and encoder on synthetic SL2 files.")
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES, help=f"file sizes, e.g. {' '.join(ALL_SCALES)}")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--channels", default=None, help="channel mix of the synthetic files, e.g. 0=2,1=1,2=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-c", "--config", default=None, help="lowFakeConfig.yaml (default: raw values, all fields)")
+    parser.add_argument("--work-dir", default="benchmarkData", help="directory for the synthetic files (default: ./benchmarkData)")
+    parser.add_argument("--results-dir", default=None, help="directory of the JSON results (default: <work-dir>/results)")
+    parser.add_argument("--baseline", default="latest", help="result file to compare with, 'latest' or 'none'")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown/memory growth before a regression")
+    parser.add_argument("--force", action="store_true", help="also run cases that probably do not fit into memory")
+    parser.add_argument("--keep-files", action="store_true", help="keep the CSV and encoded files")
+    args = parser.parse_args(argv)
+
+    results_dir = Path(args.results_dir) if args.results_dir else Path(args.work_dir) / "results"
+    results_dir.mkdir(parents=True, exist_ok=True)
+    channel_mix = None if args.channels is None else parse_channel_mix(args.channels)
+    if args.baseline == "latest":
+        baseline_path = _latest_result(results_dir, args.seed, channel_mix)
+    else:
+        baseline_path = None if args.baseline == "none" else Path(args.baseline)
+
+    results = run_benchmarks(args.scales, args.cases, args.work_dir, args.config, channel_mix, args.seed, args.force, args.keep_files)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "seed": args.seed,
+        "channel_mix": channel_mix,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    result_path = results_dir / f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(result_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved: {result_path}")
+
+    failed = [row for row in results if row["error"]]
+    if failed:
+        print(f"{len(failed)} of {len(results)} cases failed.")
+    if baseline_path is None:
+        return 1 if failed else 0
+    if not baseline_path.exists():
+        print(f"Baseline {baseline_path} not found.")
+        return 1
+    print(f"Compared with {baseline_path}:")
+    with open(baseline_path, 'r') as f:
+        regressions = compare_results(results, json.load(f), args.tolerance)
+    return 1 if regressions or failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,211 @@
+import argparse
+import math
+import re
+import struct
+
+import numpy as np
+
+from ..sl2ToCsv.lowranceToHumanReadable import FRAME_HEADER_SIZE, frame_header_dtype
+
+# Channel -> share of the frames and sounding length (packet_size) per channel, block_size = packet_size + 144
+DEFAULT_CHANNEL_MIX = {0: 1, 1: 1, 2: 1}
+DEFAULT_SOUNDING_LENGTHS = {0: 1920, 1: 1920, 2: 1920, 3: 3056, 4: 3056, 5: 3056}
+CHANNEL_FREQUENCIES = {0: 0, 1: 1, 2: 4, 3: 4, 4: 4, 5: 4} # frequency byte (+53) per channel, see _decode_frequency
+SIDESCAN_CHANNELS = {3, 4, 5}
+
+BATCH_FRAMES = 4096
+SOUNDING_POOL_ROWS = 256 # precomputed echo rows per sounding length, picked by water depth
+PING_INTERVAL_MS = 50
+START_TIME_UTC = 1748779200 # 2025-06-01 12:00 UTC
+GPS_EPOCH_OFFSET = 315964800 # time1 is stored as seconds since 1980 (see _read_file_header)
+EARTH_RADIUS_POLAR = 6356752.3142 # Lowrance Spherical Mercator
+START_LATITUDE = 52.5
+START_LONGITUDE = 13.4
+TRACK_RADIUS_M = 400.0
+BOAT_SPEED_MS = 2.5
+LOWER_LIMIT = 100 # raw range of the sounding in feet
+ALL_FLAGS_VALID = 0b1100000001101011 # TrackValid, WaterSpeedValid, PositionValid, WaterTempValid, GpsSpeedValid, AltitudeValid, HeadingValid
+
+# Unknown header bytes, taken from real Lowrance recordings (same mock bytes as in the encoder)
+HEADER_TEMPLATE = np.zeros(FRAME_HEADER_SIZE, dtype=np.uint8)
+HEADER_TEMPLATE[52:57] = [0x00, 0x0C, 0x04, 0x13, 0x10]
+HEADER_TEMPLATE[54:60] = [0x00, 0x29, 0x00, 0x01, 0x00, 0x01]
+HEADER_TEMPLATE[72:100] = [0x04, 0x04, 0x13, 0x05, 0x01, 0x01, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00,
+                           0x00, 0x01, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01, 0x01, 0x01, 0x01, 0x01]
+HEADER_TEMPLATE[134:140] = [0x00, 0x01, 0x01, 0x0D, 0x0A, 0x01]
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+
+def parse_size(text):
+    """'10MB', '1GB', '512KB' or plain bytes -> number of bytes."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?B?)\s*", str(text).upper())
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def format_size(size):
+    """Inverse of parse_size for the benchmark labels, e.g. 10485760 -> '10MB'."""
+    for unit in ("TB", "GB", "MB", "KB"):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def parse_channel_mix(text):
+    """'0=2,1=1,2=1' -> {0: 2.0, 1: 1.0, 2: 1.0}"""
+    mix = {}
+    for item in text.split(","):
+        channel, _, weight = item.partition("=")
+        mix[int(channel)] = float(weight or 1)
+    return mix
+
+
+def _sounding_pool(rng, length):
+    """SOUNDING_POOL_ROWS echo rows: noise, surface clutter and a bottom return that moves down row by row."""
+    samples = np.arange(length)
+    bottoms = np.linspace(0.05, 0.95, SOUNDING_POOL_ROWS)[:, None] * length
+    below = np.clip(samples - bottoms, 0, None)
+    echo = rng.integers(0, 40, (SOUNDING_POOL_ROWS, length)).astype(np.float64)
+    echo[:, :max(length // 50, 1)] += 150
+    echo += (samples >= bottoms) * 215 * np.exp(-below / (length * 0.08))
+    return np.clip(echo, 0, 255).astype(np.uint8)
+
+
+def _track(frame_numbers):
+    """Deterministic track as function of the global frame number: circles around the start point."""
+    seconds = frame_numbers * (PING_INTERVAL_MS / 1000)
+    angle = seconds * BOAT_SPEED_MS / TRACK_RADIUS_M
+    scale = 1 / math.cos(math.radians(START_LATITUDE)) # meters -> Mercator units at this latitude
+    x0 = EARTH_RADIUS_POLAR * math.radians(START_LONGITUDE)
+    y0 = EARTH_RADIUS_POLAR * math.log(math.tan(math.pi / 4 + math.radians(START_LATITUDE) / 2))
+    longitude = x0 + TRACK_RADIUS_M * np.sin(angle) * scale
+    latitude = y0 + TRACK_RADIUS_M * (1 - np.cos(angle)) * scale
+    heading = np.degrees(angle) % 360
+    depth = 45 + 25 * np.sin(frame_numbers / 5000 * 2 * math.pi) + 4 * np.sin(frame_numbers / 370)
+    return latitude, longitude, heading, depth
+
+
+def generate_sl2(output_path, size_bytes=None, frames=None, channel_mix=None, sounding_length=None, seed=0):
+    """Writes a synthetic SL2 file with the frame layout that SL2Decoder._decode_record expects.
+
+    Stops after `frames` frames or as soon as the file has reached size_bytes (the last frame may cross it).
+    channel_mix maps channel -> share of the frames (default DEFAULT_CHANNEL_MIX), sounding_length is one packet size
+    for all channels or a dict per channel (default DEFAULT_SOUNDING_LENGTHS). The same arguments always produce the
+    same bytes. Returns (frames, bytes) of the written file.
+    """
+    if size_bytes is None and frames is None:
+        raise ValueError("size_bytes or frames is required")
+    channel_mix = DEFAULT_CHANNEL_MIX if channel_mix is None else channel_mix
+    if sounding_length is None:
+        sounding_length = DEFAULT_SOUNDING_LENGTHS
+    channels = np.array(sorted(channel_mix), dtype=np.int16)
+    shares = np.array([channel_mix[channel] for channel in sorted(channel_mix)], dtype=np.float64)
+    shares /= shares.sum()
+    packet_sizes = np.zeros(channels.max() + 1, dtype=np.int64)
+    frequencies = np.zeros(channels.max() + 1, dtype=np.int8)
+    for channel in channels:
+        length = sounding_length.get(int(channel), 1920) if isinstance(sounding_length, dict) else sounding_length
+        packet_sizes[channel] = length
+        frequencies[channel] = CHANNEL_FREQUENCIES.get(int(channel), 0)
+
+    rng = np.random.default_rng(seed)
+    pools = {int(length): _sounding_pool(rng, int(length)) for length in np.unique(packet_sizes[channels])}
+    last_offsets = {int(channel): 0 for channel in range(6)}
+    last_block_size = int(packet_sizes[channels[0]]) + FRAME_HEADER_SIZE
+
+    # Same file header as the encoder writes: format 2 (sl2), block size of downscan or sidescan recordings
+    file_block_size = 3200 if SIDESCAN_CHANNELS & set(channels.tolist()) else 1970
+    file_header = struct.pack('<IIH', 2, file_block_size, 8)
+    pos = len(file_header)
+    written = 0
+
+    with open(output_path, 'wb') as f:
+        f.write(file_header)
+        while (frames is None or written < frames) and (size_bytes is None or pos < size_bytes):
+            n = BATCH_FRAMES if frames is None else min(BATCH_FRAMES, frames - written)
+            frame_channels = rng.choice(channels, n, p=shares)
+            sizes = packet_sizes[frame_channels] + FRAME_HEADER_SIZE
+            offsets = pos + np.cumsum(sizes) - sizes
+            if size_bytes is not None:
+                n = int(np.searchsorted(offsets, size_bytes)) # frames that start before the target size
+                frame_channels, sizes, offsets = frame_channels[:n], sizes[:n], offsets[:n]
+
+            frame_numbers = np.arange(written, written + n)
+            latitude, longitude, heading, depth = _track(frame_numbers)
+            headers = np.tile(HEADER_TEMPLATE, (n, 1))
+            fields = headers.view(frame_header_dtype()).reshape(n)
+            fields["frame_offset"] = offsets
+            for channel, name in enumerate(["prim", "sec", "downscan", "side_left", "side_right", "composite"]):
+                fields[f"{name}_last_channel_frame_offset"] = _last_offsets(frame_channels, offsets, channel, last_offsets[channel])
+                channel_offsets = offsets[frame_channels == channel]
+                if len(channel_offsets):
+                    last_offsets[channel] = int(channel_offsets[-1])
+            fields["block_size"] = sizes
+            fields["last_block_size"] = np.concatenate(([last_block_size], sizes[:-1]))
+            fields["channel"] = frame_channels
+            fields["packet_size"] = sizes - FRAME_HEADER_SIZE
+            fields["frame_index"] = frame_numbers
+            fields["upper_limit"] = 0
+            fields["lower_limit"] = LOWER_LIMIT
+            fields["frequency"] = frequencies[frame_channels]
+            fields["time1"] = START_TIME_UTC + GPS_EPOCH_OFFSET
+            fields["water_depth"] = np.rint(depth)
+            fields["keel_depth"] = 0
+            fields["speed_gps"] = round(BOAT_SPEED_MS * 1.94384)
+            fields["temperature"] = 18
+            fields["latitude"] = np.rint(latitude)
+            fields["longitude"] = np.rint(longitude)
+            fields["speed_water"] = round(BOAT_SPEED_MS * 1.94384)
+            fields["course_over_ground"] = np.rint(heading)
+            fields["altitude"] = 35
+            fields["heading"] = np.rint(heading)
+            fields["flags"] = ALL_FLAGS_VALID
+            fields["time_offset"] = frame_numbers * PING_INTERVAL_MS
+            last_block_size = int(sizes[-1])
+
+            rows = np.clip(np.rint(depth / LOWER_LIMIT * (SOUNDING_POOL_ROWS - 1)), 0, SOUNDING_POOL_ROWS - 1).astype(np.int64)
+            parts = []
+            for header, size, row in zip(headers, sizes.tolist(), rows.tolist()):
+                parts.append(header)
+                parts.append(pools[size - FRAME_HEADER_SIZE][row])
+            f.writelines(parts)
+            pos += int(sizes.sum())
+            written += n
+    return written, pos
+
+
+def _last_offsets(frame_channels, offsets, channel, previous):
+    """Offset of the last frame of `channel` before every frame, `previous` before the first one of the batch."""
+    seen = np.where(frame_channels == channel, np.arange(len(frame_channels)), -1)
+    last = np.maximum.accumulate(np.concatenate(([-1], seen[:-1])))
+    return np.where(last >= 0, offsets[np.maximum(last, 0)], previous)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Writes a deterministic synthetic SL2 file.")
+    parser.add_argument("output", help="SL2 file to write")
+    parser.add_argument("--size", default=None, help="target size, e.g. 10MB, 1GB")
+    parser.add_argument("--frames", type=int, default=None, help="number of frames instead of --size")
+    parser.add_argument("--channels", default=None, help="channel mix as channel=share, e.g. 0=2,1=1,2=1")
+    parser.add_argument("--sounding-length", type=int, default=None, help="sounding length of all channels")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.size is None and args.frames is None:
+        parser.error("--size or --frames is required")
+    frames, size = generate_sl2(
+        args.output,
+        size_bytes=None if args.size is None else parse_size(args.size),
+        frames=args.frames,
+        channel_mix=None if args.channels is None else parse_channel_mix(args.channels),
+        sounding_length=args.sounding_length,
+        seed=args.seed,
+    )
+    print(f"{args.output}: {frames} frames, {size} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
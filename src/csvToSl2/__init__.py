@@ -0,0 +1 @@
+"""CSV to SL2 encoders."""
@@ -1,3 +1,4 @@
+import argparse
 import struct
 import csv
 import os
@@ -394,14 +395,28 @@ class SL2Encoder:
         return False
 
 
-# Beispielaufruf
-csv_format = detect_csv_format(input_file)
-converter = DeeperCSVConverter(input_file) if csv_format == "deeper" else LowranceCSVConverter(input_file) if csv_format == "lowrance" else None
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encodes a Deeper or Lowrance CSV into an SL2 file.")
+    parser.add_argument("input", nargs="?", default=input_file, help="CSV file (default: the example in decoderDocs)")
+    parser.add_argument("-o", "--output", default=None, help="SL2 file (default: <input>.sl2)")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.input):
+        example = "no input given and the example CSV " if args.input == input_file else ""
+        parser.error(f"{example}{args.input} not found")
 
-if converter:
-    converter.load_csv()
-    output_file = os.path.splitext(input_file)[0] + ".sl2"
-    sl2_encoder = SL2Encoder(converter.records, output_file)
-    sl2_encoder.encode()
-else:
-    print("Ungültiges CSV-Format, bitte Deeper- oder Lowrance-CSV-Datei verwenden.")
\ No newline at end of file
+    # Beispielaufruf
+    csv_format = detect_csv_format(args.input)
+    converter = DeeperCSVConverter(args.input) if csv_format == "deeper" else LowranceCSVConverter(args.input) if csv_format == "lowrance" else None
+
+    if converter:
+        converter.load_csv()
+        output_file = args.output or os.path.splitext(args.input)[0] + ".sl2"
+        sl2_encoder = SL2Encoder(converter.records, output_file)
+        sl2_encoder.encode()
+        return 0
+    print("Ungültiges CSV-Format, bitte Deeper- oder Lowrance-CSV-Datei verwenden.")
+    return 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
\ No newline at end of file
@@ -1,3 +1,4 @@
+import argparse
 import struct
 import csv
 from pathlib import Path
@@ -154,7 +155,7 @@ class SL2Encoder:
         
         # Blockstruktur erstellen
         block = struct.pack(
-            '<iiiiiiihhhhiii5sb6siii28siiiiiiiih6si',
+            '<iiiiiiihhhhiii5sb6siii28siiiiiiiiH6si',
             frame_offset,      # Frameoffset, Länge: 4 Bytes (int), Offset: 0
             prim_last_channel_frame_offset,  # Primärer letzter Kanal Frameoffset, Länge: 4 Bytes (int), Offset: 4
             sec_last_channel_frame_offset,   # Sekundärer letzter Kanal Frameoffset, Länge: 4 Bytes (int), Offset: 8
@@ -305,7 +306,21 @@ class DeeperCSVConverter:
             return None
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encodes a decoded Lowrance CSV back into an SL2 file.")
+    parser.add_argument("input", nargs="?", default=input_file, help="CSV of the decoder (default: the example in decoderDocs)")
+    parser.add_argument("-o", "--output", default=None, help="SL2 file (default: <input>.sl2, for the example encoderDocs)")
+    args = parser.parse_args(argv)
+    if not Path(args.input).exists():
+        example = "no input given and the example CSV " if args.input == input_file else ""
+        parser.error(f"{example}{args.input} not found")
 
-encoder = SL2Encoder(input_file, output_file)
-encoder.load_csv()
-encoder.encode()
+    output = args.output or (output_file if args.input == input_file else Path(args.input).with_suffix(".sl2"))
+    encoder = SL2Encoder(args.input, output)
+    encoder.load_csv()
+    encoder.encode()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
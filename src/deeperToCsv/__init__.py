@@ -0,0 +1 @@
+"""Deeper GPS log and sonar CSV processing."""
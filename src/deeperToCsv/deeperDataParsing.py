@@ -1,10 +1,32 @@
+import argparse
+from bisect import bisect_left
 import csv
 from datetime import datetime, timedelta, timezone
 import os
-import utm
-from tqdm.auto import tqdm
+import sys
 from multiprocessing import Pool, cpu_count
 
+if __name__ == "__main__" and not __package__:
+    # Run as a script (python src/deeperToCsv/deeperDataParsing.py): the relative imports need the package,
+    # so the module of the installed lowfake package is run instead
+    import importlib.util
+    import runpy
+    if importlib.util.find_spec("lowfake") is None:
+        sys.exit("lowfake is not installed, run pip install -e . and then lowfake-deeper or python -m lowfake.deeperToCsv.deeperDataParsing")
+    runpy.run_module("lowfake.deeperToCsv.deeperDataParsing", run_name="__main__", alter_sys=True)
+    sys.exit()
+
+from ..lazyImport import LazyModule
+
+# utm and tqdm are imported on first use, importing this module stays cheap for short-lived workers
+utm = LazyModule("utm", globals(), "utm")
+
+
+def tqdm(iterable=None, **kwargs):
+    """Progress bar of tqdm.auto, tqdm is only imported when the first bar is shown."""
+    from tqdm.auto import tqdm as progress_bar
+    return progress_bar(iterable, **kwargs)
+
 # Helper functions
 def gps_weeks_to_millis(weeks):
     """Convert GPS weeks to milliseconds."""
@@ -52,6 +74,25 @@ def interpolate_gps_and_metrics(before, after, target_timestamp):
 
 
 
+def index_gps_timestamps(gps_data):
+    """Sorted distinct timestamps of gps_data and the first (position, entry) of gps_data for each of them."""
+    first_entries = {}
+    for position, entry in enumerate(gps_data):
+        first_entries.setdefault(entry[0], (position, entry))
+    return sorted(first_entries), first_entries
+
+
+def find_closest_gps_entry(gps_timestamps, first_entries, target_timestamp):
+    """The entry of gps_data with the smallest time difference to target_timestamp, by binary search.
+
+    Same choice as min(gps_data, key=lambda x: abs(x[0] - target_timestamp)): on equal differences the entry that
+    comes first in gps_data wins. Raises ValueError for empty gps_data like min().
+    """
+    i = bisect_left(gps_timestamps, target_timestamp)
+    candidates = [first_entries[timestamp] for timestamp in gps_timestamps[max(i - 1, 0):i + 1]]
+    return min(candidates, key=lambda candidate: (abs(candidate[1][0] - target_timestamp), candidate[0]))[1]
+
+
 def find_nearest_gps_entries_fixed_interval(gps_data, target_timestamp, reference_timestamp, interval_ms=200):
     """Find the nearest GPS entries in an array with a fixed interval by calculating position directly."""
     # Round the timestamp to the next multiple of interval_ms
@@ -109,6 +150,8 @@ def process_rows_for_matching(args):
 
     # Referenz-Zeitstempel ist der erste Eintrag
     reference_timestamp = gps_data[0][0]
+    if method == "smallestDifference":
+        gps_timestamps, first_entries = index_gps_timestamps(gps_data)
 
     for synched_row in synched_rows:
         try:
@@ -116,7 +159,7 @@ def process_rows_for_matching(args):
 
             if method == "smallestDifference":
                 # Finde den nächsten GPS-Wert
-                closest_gps_row = min(gps_data, key=lambda x: abs(x[0] - target_timestamp))
+                closest_gps_row = find_closest_gps_entry(gps_timestamps, first_entries, target_timestamp)
                 closest_timestamp, gps_row = closest_gps_row
                 time_difference = closest_timestamp - target_timestamp
                 lat = float(closest_gps_row[8])
@@ -441,9 +484,18 @@ def remove_columns_by_header(file_path, headers_to_remove):
 
 
 # Modify main function to use parallel matching for Step 5
-def main():
-    folder_path = r'C:\Users\ssteinhauser\Masterthesis\Sonar3DReconstruction\Temp'
-    logfile_number = '00000016'
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synchronizes Deeper bathymetry and sonar data with the GPS log.")
+    parser.add_argument("folder", help="folder with <logfile>.log, bathymetry.csv and sonar.csv")
+    parser.add_argument("-l", "--logfile", default='00000016', help="number of the GPS log file")
+    parser.add_argument("--utm", action="store_true", help="add UTM coordinates (needs utm)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.folder):
+        parser.error(f"folder {args.folder} not found")
+
+    folder_path = args.folder
+    logfile_number = args.logfile
     log_file_name = f'{logfile_number}.log'
     input_file_path = os.path.join(folder_path, log_file_name)
 
@@ -463,7 +515,7 @@ def main():
     synchronize_data(output_path_filtered_firstStage, input_path_sonar, output_path_filtered_secondStage)
     if os.path.getsize(output_path_filtered_secondStage) == 0:
         print("Warning: Synchronize data step produced an empty output. Verify sonar.csv and bathymetry.csv data.")
-        return  # Stop if empty
+        return 1  # Stop if empty
     
    # 3.1 Remove duplicate timestamps (optional)
     remove_duplicate_timestamps(output_path_filtered_secondStage)
@@ -474,7 +526,7 @@ def main():
 
     # 5. Match GPS data with synched Deeper data using multiprocessing
     final_output_file = os.path.join(folder_path, 'synchedDeeperData.csv')
-    match_gps_with_synched_data_parallel(output_path_filtered_thirdStage, output_file_path_unix, final_output_file, convert_to_utm=False, num_processes=None, method="smallestDifference")
+    match_gps_with_synched_data_parallel(output_path_filtered_thirdStage, output_file_path_unix, final_output_file, convert_to_utm=args.utm, num_processes=args.workers, method="smallestDifference")
 
     # 6. Delete intermediate files
     temp_files = [
@@ -491,6 +543,7 @@ def main():
 
 
     print("All steps have been completed successfully.")
+    return 0
 
 if __name__ == '__main__':
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,26 @@
+import importlib
+
+
+class LazyModule:
+    """Stands in for a module and imports it on the first attribute access.
+
+    With namespace and name (e.g. globals() and "np") the proxy replaces itself there by the real module, so only the
+    first access goes through __getattr__.
+    """
+
+    def __init__(self, module_name, namespace=None, name=None):
+        self._module_name = module_name
+        self._namespace = namespace
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+            if self._namespace is not None:
+                self._namespace[self._name] = self._module
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._module_name} ({state})>"
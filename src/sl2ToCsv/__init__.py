@@ -0,0 +1 @@
+"""Lowrance SL2/SLG/SL3 decoder, batch decoding and decode cache."""
@@ -0,0 +1,150 @@
+import argparse
+import csv
+import glob
+import os
+import time
+from multiprocessing import Pool, cpu_count
+from pathlib import Path
+
+from .lowranceToHumanReadable import SL2Decoder
+
+SONAR_SUFFIXES = {".sl2", ".slg", ".sl3"}
+OUTPUT_SUFFIXES = {"csv": ".csv", "npz": ".npz", "parquet": ".parquet", "arrow": ".arrow", "archive": ".sl2a"}
+SUMMARY_HEADERS = ["file", "frames", "bytes", "seconds", "frames_per_s", "output", "error"]
+
+
+def collect_sonar_files(inputs):
+    """Expands directories, glob patterns and file names to the list of .sl2/.slg/.sl3 files."""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = Path(item).iterdir()
+        elif glob.has_magic(item):
+            candidates = (Path(path) for path in glob.glob(item, recursive=True))
+        else:
+            candidates = [Path(item)]
+        files.extend(path for path in candidates if path.is_file() and path.suffix.lower() in SONAR_SUFFIXES)
+    return sorted(set(files))
+
+
+def _counted(records, counter):
+    for record in records:
+        counter[0] += 1
+        yield record
+
+
+def output_paths(files, output_dir, output_format):
+    """Output path per input file, mirroring the input paths below their common directory in output_dir.
+
+    Files that would still share an output (e.g. track.sl2 and track.slg) keep their sonar suffix in the name.
+    Raises ValueError if two inputs map to the same output anyway.
+    """
+    suffix = OUTPUT_SUFFIXES[output_format]
+    resolved = [path.resolve() for path in files]
+    base = Path(os.path.commonpath([path.parent for path in resolved])) if resolved else Path()
+    relative = [path.relative_to(base) for path in resolved]
+
+    def collision_key(path):
+        return str(path).casefold()  # also collide on case-insensitive file systems
+
+    stems = {}
+    for path in relative:
+        key = collision_key(path.with_suffix(suffix))
+        stems[key] = stems.get(key, 0) + 1
+    outputs = {}
+    for filepath, path in zip(files, relative):
+        name = path.with_suffix(suffix)
+        if stems[collision_key(name)] > 1:
+            name = path.with_name(path.name + suffix)
+        outputs[filepath] = Path(output_dir) / name
+
+    seen = {}
+    for filepath, output_path in outputs.items():
+        key = collision_key(output_path)
+        if key in seen:
+            raise ValueError(f"{seen[key]} and {filepath} would both be decoded to {output_path}")
+        seen[key] = filepath
+    return outputs
+
+
+def decode_file(args):
+    """Worker: decodes one file to output_path and returns its summary row."""
+    filepath, config_path, output_path, output_format = args
+    summary = {"file": str(filepath), "frames": 0, "bytes": filepath.stat().st_size, "seconds": 0.0,
+               "frames_per_s": 0.0, "output": str(output_path), "error": ""}
+
+    start = time.perf_counter()
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        decoder = SL2Decoder(filepath, config_path, verbose=False)
+        if output_format == "csv":
+            counter = [0]
+            decoder.save_to_csv(output_path, _counted(decoder.iter_records(), counter))  # streaming, constant memory
+            summary["frames"] = counter[0]
+        else:
+            decoder.decode_columns()
+            summary["frames"] = len(decoder.records)
+            getattr(decoder, f"save_to_{output_format}")(output_path)
+    except Exception as e:
+        summary["error"] = f"{type(e).__name__}: {e}"
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    if summary["seconds"] > 0:
+        summary["frames_per_s"] = round(summary["frames"] / summary["seconds"], 1)
+    return summary
+
+
+def decode_batch(files, config_path, output_dir, output_format="csv", num_processes=None, summary_path=None):
+    """Decodes the files on a process pool, largest first so the long runs do not end up at the tail.
+
+    The outputs mirror the input directory layout below output_dir (see output_paths).
+    """
+    if num_processes is None:
+        num_processes = cpu_count()  # Use the available CPU cores
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    summary_path = Path(summary_path or output_dir / "batch_summary.csv")
+
+    outputs = output_paths(files, output_dir, output_format)  # checked for collisions before any job starts
+    files = sorted(files, key=lambda path: path.stat().st_size, reverse=True)
+    jobs = [(path, config_path, outputs[path], output_format) for path in files]
+
+    summaries = []
+    with Pool(processes=min(num_processes, max(len(jobs), 1))) as pool, open(summary_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_HEADERS)
+        writer.writeheader()
+        for summary in pool.imap_unordered(decode_file, jobs, chunksize=1):
+            writer.writerow(summary)
+            f.flush()
+            summaries.append(summary)
+            status = f"error: {summary['error']}" if summary["error"] else f"{summary['frames']} frames, {summary['frames_per_s']} frames/s"
+            print(f"[{len(summaries)}/{len(jobs)}] {summary['file']}: {status} ({summary['seconds']} s)")
+
+    print(f"Summary saved: {summary_path}")
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decodes many SL2/SLG/SL3 files in parallel.")
+    parser.add_argument("inputs", nargs="+", help="directories, glob patterns (quoted) or files")
+    parser.add_argument("-c", "--config", default=None, help="lowFakeConfig.yaml (default: raw values, all fields)")
+    parser.add_argument("-o", "--output-dir", default=".", help="directory for the decoded files and the summary")
+    parser.add_argument("-f", "--format", choices=sorted(OUTPUT_SUFFIXES), default="csv", help="output format")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--summary", default=None, help="summary CSV (default: <output-dir>/batch_summary.csv)")
+    args = parser.parse_args(argv)
+
+    files = collect_sonar_files(args.inputs)
+    if not files:
+        print("No .sl2/.slg/.sl3 files found.")
+        return 1
+    try:
+        summaries = decode_batch(files, args.config, args.output_dir, args.format, args.workers, args.summary)
+    except ValueError as e:
+        print(e)
+        return 1
+    return 1 if any(summary["error"] for summary in summaries) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+from ..lazyImport import LazyModule
+
+np = LazyModule("numpy", globals(), "np")
+
+CACHE_VERSION = 2  # increase when the layout of the cached arrays changes
+HASH_CHUNK_SIZE = 1 << 20
+
+
+class SL2DecodeCache:
+    """Content-addressed on-disk cache for the columnar decode result (SL2Decoder.to_arrays) of SL2 files.
+
+    Entries are keyed by size, mtime and content hash of the file plus the effective decoder config. Every entry is a
+    directory with one .npy per column (and `soundings.npy`), a hit maps them read-only instead of decoding again.
+    The cache is kept below max_bytes by evicting the least recently used entries.
+    Several processes can share a cache directory, the bookkeeping files are updated under a lock file.
+    """
+
+    def __init__(self, cache_dir, max_bytes=10 * 1024 ** 3):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.stats_path = self.cache_dir / "stats.json"
+        self.hashes_path = self.cache_dir / "hashes.json"
+        self.lock_path = self.cache_dir / "cache.lock"
+
+    def decode(self, decoder):
+        """Returns (columns, soundings) of the decoder's file, from the cache or decoded with decode_columns()."""
+        cached = self.get(decoder)
+        if cached is not None:
+            return cached
+        decoder.decode_columns()
+        columns, soundings = decoder.to_arrays()
+        self.put(decoder, columns, soundings)
+        return columns, soundings
+
+    def get(self, decoder):
+        """Returns the cached (columns, soundings) for the decoder or None."""
+        entry = self.cache_dir / self.key(decoder)
+        with self._locked():  # _evict() of another process cannot remove the entry while it is loaded
+            cached = self._load_entry(entry) if entry.is_dir() else None
+        self._count("misses" if cached is None else "hits")
+        return cached
+
+    def _load_entry(self, entry):
+        """Maps the arrays of an entry and marks it as recently used, None if the entry is incomplete."""
+        columns = {}
+        soundings = None
+        try:
+            for path in entry.glob("*.npy"):
+                values = np.load(path, mmap_mode='r')
+                if path.stem == "soundings":
+                    soundings = values
+                else:
+                    columns[path.stem] = values
+            with open(entry / "columns.json", 'r') as f:
+                order = json.load(f)
+            cached = {name: columns[name] for name in order}, soundings
+            os.utime(entry)  # mark as recently used
+        except (OSError, ValueError, KeyError):
+            return None
+        return cached
+
+    def put(self, decoder, columns, soundings):
+        """Stores the decode result and evicts old entries if the cache exceeds max_bytes."""
+        key = self.key(decoder)
+        entry = self.cache_dir / key
+        if entry.is_dir():
+            return
+        tmp_entry = self.cache_dir / f"{key}.tmp{os.getpid()}"
+        tmp_entry.mkdir(exist_ok=True)
+        for name, values in columns.items():
+            np.save(tmp_entry / f"{name}.npy", values)
+        if soundings is not None:
+            np.save(tmp_entry / "soundings.npy", soundings)
+        with open(tmp_entry / "columns.json", 'w') as f:
+            json.dump(list(columns), f)
+        with self._locked():
+            if entry.is_dir():  # another process stored the same entry in the meantime, keep that one
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+            else:
+                os.replace(tmp_entry, entry)
+        self._evict()
+
+    def key(self, decoder):
+        """Cache key from size, mtime and content hash of the file and the decoder config."""
+        stat = os.stat(decoder.filepath)
+        identity = {
+            "version": CACHE_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "content": self._content_hash(decoder.filepath, stat),
+            "config": decoder.config,
+        }
+        return hashlib.blake2b(json.dumps(identity, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+    def _content_hash(self, filepath, stat):
+        """Hash of the file content, remembered per (path, size, mtime) so unchanged files are read only once."""
+        memo_key = f"{Path(filepath).resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+        content_hash = self._read_json(self.hashes_path).get(memo_key)
+        if content_hash is not None:
+            return content_hash
+
+        digest = hashlib.blake2b(digest_size=16)
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        with self._locked():
+            hashes = self._prune_hashes(self._read_json(self.hashes_path))
+            hashes[memo_key] = digest.hexdigest()
+            self._write_json(self.hashes_path, hashes)
+        return hashes[memo_key]
+
+    def _prune_hashes(self, hashes):
+        """Drops the remembered hashes of files that were deleted or changed since."""
+        kept = {}
+        for memo_key, content_hash in hashes.items():
+            path, size, mtime_ns = memo_key.rsplit("|", 2)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if f"{stat.st_size}|{stat.st_mtime_ns}" == f"{size}|{mtime_ns}":
+                kept[memo_key] = content_hash
+        return kept
+
+    def _entries(self):
+        """All complete entries as (last use, size in bytes, path)."""
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            if entry.is_dir() and ".tmp" not in entry.name:
+                try:
+                    size = sum(path.stat().st_size for path in entry.iterdir())
+                    entries.append((entry.stat().st_mtime, size, entry))
+                except FileNotFoundError:
+                    continue  # evicted by another process meanwhile
+        return entries
+
+    def _evict(self):
+        """Removes the least recently used entries until the cache fits into max_bytes."""
+        evicted = 0
+        with self._locked():
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                evicted += 1
+        if evicted:  # _count takes the lock itself
+            self._count("evictions", evicted)
+
+    def stats(self):
+        """Hit/miss/eviction counters (over all runs) and the current size of the cache."""
+        stats = {"hits": 0, "misses": 0, "evictions": 0}
+        stats.update(self._read_json(self.stats_path))
+        entries = self._entries()
+        requests = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / requests if requests else 0.0
+        stats["entries"] = len(entries)
+        stats["bytes"] = sum(size for _, size, _ in entries)
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def _count(self, name, n=1):
+        with self._locked():
+            stats = self._read_json(self.stats_path)
+            stats[name] = stats.get(name, 0) + n
+            self._write_json(self.stats_path, stats)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on the cache directory (across processes) for the read-modify-write of the bookkeeping."""
+        with open(self.lock_path, 'a+b') as f:
+            if os.name == "nt":
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.01)  # LK_LOCK gives up after 10 s
+                try:
+                    yield
+                finally:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read_json(self, path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_json(self, path, data):
+        tmp_path = path.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+# Example usage
+# cache = SL2DecodeCache('decodeCache', max_bytes=50 * 1024 ** 3)
+# columns, soundings = cache.decode(SL2Decoder('path_to_file.sl2', 'lowFakeConfig.yaml'))
+# print(cache.stats())
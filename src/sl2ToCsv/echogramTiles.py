@@ -0,0 +1,230 @@
+import argparse
+import json
+import struct
+import zlib
+from pathlib import Path
+
+from ..lazyImport import LazyModule
+from .lowranceToHumanReadable import FILE_HEADER_SIZE, FRAME_HEADER_SIZE, SL2Decoder, _derived_value, frame_header_dtype
+
+np = LazyModule("numpy", globals(), "np")
+
+# Tiles are written as <output_dir>/<level>/<x>/<y>.png. Level 0 has one pixel per frame (x, time) and per sounding
+# sample (y, depth), every following level halves both directions with the chosen reduction. x counts from the first
+# frame, y from the surface. Tiles at the right and bottom border are smaller than tile_size.
+DEFAULT_TILE_SIZE = 256
+REDUCTIONS = ("max", "mean")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_COMPRESSION_LEVEL = 1  # sonar noise hardly compresses, higher levels are much slower for a few percent
+
+
+def _sonar_palette():
+    """Dark blue -> blue -> yellow -> red -> white, the usual look of a sonar display."""
+    stops = np.array([0, 64, 128, 192, 255])
+    colors = np.array([[0, 0, 32], [0, 64, 192], [240, 220, 40], [220, 40, 0], [255, 255, 255]])
+    values = np.arange(256)
+    return np.stack([np.interp(values, stops, colors[:, i]) for i in range(3)], axis=1).astype(np.uint8)
+
+
+PALETTES = {"gray": None, "sonar": _sonar_palette}
+
+
+def write_png(path, image, palette=None):
+    """Writes a 2-D uint8 array as 8 bit grayscale PNG, or as indexed PNG with a (256, 3) uint8 palette."""
+    with open(path, 'wb') as f:
+        f.write(encode_png(image, palette))
+
+
+def encode_png(image, palette=None):
+    """The PNG file of write_png as bytes."""
+    height, width = image.shape
+    rows = np.zeros((height, width + 1), dtype=np.uint8)  # filter byte 0 (None) in front of every row
+    rows[:, 1:] = image
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    color_type = 0 if palette is None else 3
+    parts = [PNG_SIGNATURE, chunk(b"IHDR", struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))]
+    if palette is not None:
+        parts.append(chunk(b"PLTE", np.ascontiguousarray(palette, dtype=np.uint8).tobytes()))
+    parts.append(chunk(b"IDAT", zlib.compress(rows.tobytes(), PNG_COMPRESSION_LEVEL)))
+    parts.append(chunk(b"IEND", b""))
+    return b"".join(parts)
+
+
+def reduce_pairs(values, axis, reduction="max"):
+    """Halves `values` along `axis` by combining neighbouring pairs (a trailing single element is kept as it is)."""
+    values = np.moveaxis(values, axis, 0)
+    even = values.shape[0] // 2 * 2
+    if reduction == "max":
+        reduced = np.maximum(values[0:even:2], values[1:even:2])
+    else:
+        reduced = ((values[0:even:2].astype(np.uint16) + values[1:even:2] + 1) >> 1).astype(np.uint8)  # rounded mean
+    if even < values.shape[0]:
+        reduced = np.concatenate([reduced, values[even:]])
+    return np.moveaxis(reduced, 0, axis)
+
+
+def _first_channel(filepath):
+    """Channel code of the first frame of a file."""
+    with open(filepath, 'rb') as f:
+        f.seek(FILE_HEADER_SIZE)
+        header = f.read(FRAME_HEADER_SIZE)
+    if len(header) < FRAME_HEADER_SIZE:
+        raise ValueError(f"{filepath} has no complete frame")
+    return int(np.frombuffer(header, dtype=frame_header_dtype())["channel"][0])
+
+
+class _Level:
+    """Pending strip of one zoom level: up to tile_size frames (rows) x the depth of the level (columns)."""
+
+    def __init__(self, number, depth, tile_size):
+        self.number = number
+        self.depth = depth
+        self.strip = np.zeros((tile_size, depth), dtype=np.uint8)
+        self.filled = 0
+        self.width = 0  # frames (pixels in x) written so far
+
+
+class EchogramRenderer:
+    """Renders the soundings of one channel as waterfall tile pyramid, streaming over the file.
+
+    Memory use is fixed: one decoder batch plus one strip of tile_size frames per zoom level, independent of the
+    length of the recording. The pyramid ends at the first level that fits into a single tile.
+
+    renderer = EchogramRenderer('tiles', reduction='max', palette='sonar')
+    renderer.render(SL2Decoder('path_to_file.sl2', 'lowFakeConfig.yaml'), channel='downscan')
+    """
+
+    def __init__(self, output_dir, tile_size=DEFAULT_TILE_SIZE, reduction="max", palette="gray", batch_frames=4096):
+        if reduction not in REDUCTIONS:
+            raise ValueError(f"Unknown reduction: {reduction} (available: {', '.join(REDUCTIONS)})")
+        if palette not in PALETTES:
+            raise ValueError(f"Unknown palette: {palette} (available: {', '.join(PALETTES)})")
+        if tile_size % 2:
+            raise ValueError("tile_size must be even")
+        self.output_dir = Path(output_dir)
+        self.tile_size = tile_size
+        self.reduction = reduction
+        self.palette_name = palette
+        self.palette = None if PALETTES[palette] is None else PALETTES[palette]()
+        self.batch_frames = batch_frames
+        self.levels = []
+        self.tiles = 0
+
+    def render(self, decoder, channel=None, depth=None):
+        """Renders all frames of `channel` (code or name, default: channel of the first frame) and returns the metadata.
+
+        depth is the number of sounding samples of level 0, by default the sounding length of the first frame; longer
+        soundings are cut, shorter ones padded with 0.
+        """
+        code = _first_channel(decoder.filepath) if channel is None else decoder._channel_code(channel)
+        self.levels = []
+        self.tiles = 0
+        frames = 0
+        first_time = last_time = None
+        for columns, soundings in decoder.iter_batches(self.batch_frames, [code]):
+            if soundings is None:
+                raise ValueError("the config does not decode sounding data, rendering needs it")
+            if not self.levels:
+                self._start(depth or int(columns["sounding_length"][0]))
+            matrix = np.zeros((len(soundings), self.levels[0].depth), dtype=np.uint8)
+            width = min(soundings.shape[1], self.levels[0].depth)
+            matrix[:, :width] = soundings[:, :width]
+            self._push(0, matrix)
+            frames += len(matrix)
+            if "time_offset" in columns:
+                first_time = int(columns["time_offset"][0]) if first_time is None else first_time
+                last_time = int(columns["time_offset"][-1])
+
+        if not self.levels:
+            raise ValueError(f"no frames of channel {code} in {decoder.filepath}")
+        self._finish()
+        metadata = {
+            "source": str(decoder.filepath),
+            "channel": code,
+            "channel_name": _derived_value("channel_name", code),
+            "frames": frames,
+            "time_offset_first": first_time,
+            "time_offset_last": last_time,
+            "tile_size": self.tile_size,
+            "reduction": self.reduction,
+            "palette": self.palette_name,
+            "levels": [
+                {"level": level.number, "width": level.width, "height": level.depth,
+                 "tiles_x": -(-level.width // self.tile_size), "tiles_y": -(-level.depth // self.tile_size)}
+                for level in self.levels
+            ],
+        }
+        with open(self.output_dir / "tiles.json", 'w') as f:
+            json.dump(metadata, f, indent=2)
+        if decoder.verbose:
+            print(f"Echogram rendered: {frames} frames, {len(self.levels)} levels, {self.tiles} tiles in {self.output_dir}")
+        return metadata
+
+    def _start(self, depth):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.levels = [_Level(0, depth, self.tile_size)]
+
+    def _push(self, number, frames):
+        """Appends frames (frames x depth) to the strip of a level, every full strip is written and reduced."""
+        level = self.levels[number]
+        while len(frames):
+            count = min(len(frames), self.tile_size - level.filled)
+            level.strip[level.filled:level.filled + count] = frames[:count]
+            level.filled += count
+            frames = frames[count:]
+            if level.filled == self.tile_size:
+                self._flush(level)
+
+    def _flush(self, level):
+        """Writes the tiles of the pending strip and hands the strip reduced by 2 x 2 to the next level."""
+        strip = level.strip[:level.filled]
+        x = level.width // self.tile_size
+        column_dir = self.output_dir / str(level.number) / str(x)
+        column_dir.mkdir(parents=True, exist_ok=True)
+        for y in range(0, level.depth, self.tile_size):
+            write_png(column_dir / f"{y // self.tile_size}.png", strip[:, y:y + self.tile_size].T, self.palette)
+            self.tiles += 1
+        level.width += level.filled
+        level.filled = 0
+
+        reduced = reduce_pairs(reduce_pairs(strip, 0, self.reduction), 1, self.reduction)
+        if level.number + 1 == len(self.levels):
+            self.levels.append(_Level(level.number + 1, reduced.shape[1], self.tile_size))
+        self._push(level.number + 1, reduced)
+
+    def _finish(self):
+        """Writes the partial strips, level by level, and drops the levels above the first single tile level."""
+        number = 0
+        while number < len(self.levels):
+            level = self.levels[number]
+            if level.filled:
+                self._flush(level)
+            if level.width <= self.tile_size and level.depth <= self.tile_size:
+                del self.levels[number + 1:]  # only partial strips, a level writes after tile_size frames
+                break
+            number += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Renders the soundings of a sonar file as echogram tile pyramid (PNG).")
+    parser.add_argument("input", help="sonar file")
+    parser.add_argument("output_dir", help="directory of the tiles")
+    parser.add_argument("-c", "--config", default=None, help="lowFakeConfig.yaml (default: raw values, all fields)")
+    parser.add_argument("--channel", default=None, help="channel code or name, e.g. downscan (default: first frame)")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument("--reduction", choices=REDUCTIONS, default="max", help="how pixels are combined per level")
+    parser.add_argument("--palette", choices=sorted(PALETTES), default="gray")
+    parser.add_argument("--depth", type=int, default=None, help="sounding samples of level 0 (default: first frame)")
+    args = parser.parse_args(argv)
+
+    channel = int(args.channel) if args.channel is not None and args.channel.isdigit() else args.channel
+    decoder = SL2Decoder(args.input, args.config)
+    EchogramRenderer(args.output_dir, args.tile_size, args.reduction, args.palette).render(decoder, channel, args.depth)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,13 +1,40 @@
-# Please take to note, that this script is only usable for coordinates in the northern hemisphere. 
-# For the southern hemisphere (or negative lat/lng coordinates), the calculation of the coordinates has to be adjusted.
+# Decoded records keep the raw values. Units and WGS84 coordinates (both hemispheres) are converted for whole columns
+# with SL2Decoder.convert_columns, e.g. to_arrays(convert=True) and the columnar exports.
 import struct
-from bitarray import bitarray
-import yaml
-from math import exp, atan, pi
+from math import ceil, floor
 from datetime import datetime, timezone
+import argparse
 import csv
+import io
+import json
+import mmap
+import os
+import platform
+import sys
+import time
+from collections import Counter
+from collections.abc import Sequence
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from itertools import chain
+from multiprocessing import Pool, cpu_count
 from pathlib import Path
 
+if __name__ == "__main__" and not __package__:
+    # Run as a script (python src/sl2ToCsv/lowranceToHumanReadable.py): the relative imports need the package,
+    # so the module of the installed lowfake package is run instead
+    import importlib.util
+    import runpy
+    if importlib.util.find_spec("lowfake") is None:
+        sys.exit("lowfake is not installed, run pip install -e . and then lowfake-decode or python -m lowfake.sl2ToCsv.lowranceToHumanReadable")
+    runpy.run_module("lowfake.sl2ToCsv.lowranceToHumanReadable", run_name="__main__", alter_sys=True)
+    sys.exit()
+
+from ..lazyImport import LazyModule
+
+# NumPy and YAML are imported on first use, importing this module stays cheap for short-lived workers
+np = LazyModule("numpy", globals(), "np")
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 DECODER_DIR = BASE_DIR / "decoderDocs"
 
@@ -16,12 +43,357 @@ config_path = DECODER_DIR / "lowFakeConfig.yaml"
 csv_path = DECODER_DIR / "sl2ToCsvOutput_raw_Chart_03082005.csv"
 csv_path_cleaned = DECODER_DIR / "sl2ToCsvOutput_Chart_03082005.csv"
 
+FILE_HEADER_SIZE = 10 # sources are not clear about this value
+FRAME_HEADER_SIZE = 144
+
+# Layout of the frame header as (name, offset, struct format), same offsets and order as in _decode_record
+FRAME_HEADER_FIELDS = [
+    ("frame_offset", 0, "<I"),
+    ("prim_last_channel_frame_offset", 4, "<I"),
+    ("sec_last_channel_frame_offset", 8, "<I"),
+    ("downscan_last_channel_frame_offset", 12, "<I"),
+    ("side_left_last_channel_frame_offset", 16, "<I"),
+    ("side_right_last_channel_frame_offset", 20, "<I"),
+    ("composite_last_channel_frame_offset", 24, "<I"),
+    ("block_size", 28, "<h"),
+    ("last_block_size", 30, "<h"),
+    ("channel", 32, "<h"),
+    ("packet_size", 34, "<h"),
+    ("frame_index", 36, "<i"),
+    ("upper_limit", 40, "<I"),
+    ("lower_limit", 48, "<I"),
+    *[(f"unknownPart1_{i + 1}", 52 + i, "<B") for i in range(5)],
+    ("frequency", 53, "<b"), # overlaps unknownPart1_2
+    *[(f"unknownPart2_{i + 1}", 54 + i, "<B") for i in range(6)],
+    ("time1", 60, "<I"),
+    ("water_depth", 64, "<i"),
+    ("keel_depth", 68, "<i"),
+    *[(f"unknownPart3_{i + 1}", 72 + i, "<B") for i in range(28)],
+    ("speed_gps", 100, "<i"),
+    ("temperature", 104, "<i"),
+    ("latitude", 108, "<i"),
+    ("longitude", 112, "<i"),
+    ("speed_water", 116, "<i"),
+    ("course_over_ground", 120, "<i"),
+    ("altitude", 124, "<i"),
+    ("heading", 128, "<i"),
+    ("flags", 132, "<H"),
+    *[(f"unknownPart4_{i + 1}", 134 + i, "<B") for i in range(6)],
+    ("time_offset", 140, "<i"),
+]
+
+FRAME_HEADER_NAMES = tuple(name for name, _, _ in FRAME_HEADER_FIELDS)
+
+
+@lru_cache(maxsize=None)
+def frame_header_dtype():
+    """The whole frame header as one structured dtype (FRAME_HEADER_DTYPE), used to decode all frames in bulk."""
+    return np.dtype({
+        "names": list(FRAME_HEADER_NAMES),
+        "formats": [fmt for _, _, fmt in FRAME_HEADER_FIELDS],
+        "offsets": [offset for _, offset, _ in FRAME_HEADER_FIELDS],
+        "itemsize": FRAME_HEADER_SIZE,
+    })
+
+PACKET_SIZE_STRUCT = struct.Struct('<H')
+
+# Bits of the flags field (+132) and names of the channel and frequency codes
+FLAG_BITS = {
+    "TrackValid": 0,
+    "WaterSpeedValid": 1,
+    "PositionValid": 3,
+    "WaterTempValid": 5,
+    "GpsSpeedValid": 6,
+    "AltitudeValid": 14,
+    "HeadingValid": 15,
+}
+CHANNEL_NAMES = {
+    0: "Primary",
+    1: "Secondary",
+    2: "DSI (Downscan)",
+    3: "Left (Sidescan)",
+    4: "Right (Sidescan)",
+    5: "Composite",
+}
+FREQUENCY_NAMES = {
+    0: "200 KHz",
+    1: "50 KHz",
+    2: "83 KHz",
+    4: "800 KHz",
+    5: "38 KHz",
+    6: "28 KHz",
+    7: "130-210 KHz",
+    8: "90-150 KHz",
+    9: "40-60 KHz",
+    10: "25-45 KHz",
+}
+UNKNOWN_CODE_NAME = "Other/invalid"
+
+# Columns derived from a header field: one boolean column per flag bit and the channel/frequency names.
+# They can be selected in `fields` and used in `filter` like the header fields.
+DERIVED_FIELDS = {**{name: "flags" for name in FLAG_BITS}, "channel_name": "channel", "frequency_name": "frequency"}
+CATEGORY_NAMES = {"channel_name": CHANNEL_NAMES, "frequency_name": FREQUENCY_NAMES}
+
+# Resynchronization after damaged frames: block sizes of plausible frame headers and search chunk size
+RESYNC_BLOCK_SIZES = (1970, 3200, 2064)
+RESYNC_CHUNK_SIZE = 1 << 22
+PROBE_CHUNK_SIZE = 1 << 14 # search window of the time bisection in extract(), a few frames
+GPS_EPOCH_OFFSET = 315964800 # time1 is stored as seconds since 1980 (GPS time)
+RESYNC_STRUCT = struct.Struct('<HhhHi') # block_size, last_block_size, channel, packet_size, frame_index at +28
+
+CSV_SOUNDING_COLUMNS = 1920 # Anzahl der Sounding-Spalten in der CSV (fest definiert)
+CSV_WRITE_BUFFER = 1 << 20
+FILTER_RANGE_KEYS = {"min", "max"}  # keys of a range rule in `filter:`
+CLEAN_CHECK_FIELDS = {"block_size": 2064, "last_block_size": 2064, "packet_size": 1920} # valid rows of clean_csv
+SOUNDING_TEXT = [str(value) for value in range(256)] # CSV text of every possible sounding byte
+SOUNDING_REDUCTIONS = ("max", "mean", "nearest") # `soundings: reduction` in the config
+GATHER_CHUNK_FRAMES = 4096 # frames copied at full resolution at a time when the soundings are reduced
+
+# Sidecar frame index (<file>.idx): header with magic, version, size and mtime of the indexed file and frame count,
+# followed by one FRAME_INDEX_DTYPE record per frame
+INDEX_MAGIC = b"SL2I"
+INDEX_VERSION = 1
+INDEX_HEADER_STRUCT = struct.Struct('<4sHQqQ')
+
+
+@lru_cache(maxsize=None)
+def frame_index_dtype():
+    """Record of the sidecar frame index (FRAME_INDEX_DTYPE)."""
+    return np.dtype([
+        ("offset", "<u8"),
+        ("channel", "<i2"),
+        ("frame_index", "<i4"),
+        ("time_offset", "<i4"),
+        ("packet_size", "<u2"),
+    ])
+
+
+@lru_cache(maxsize=None)
+def _sounding_bins(length, bins):
+    """(starts, counts, centers) of `bins` equal bins over `length` samples, bins repeat a sample if length < bins."""
+    edges = np.arange(bins + 1) * length // bins
+    return edges[:-1], np.maximum(np.diff(edges), 1), (2 * np.arange(bins) + 1) * length // (2 * bins)
+
+
+def reduce_soundings(soundings, lengths, bins, reduction="max"):
+    """Reduces the first lengths[i] samples of every row of a uint8 sounding matrix to `bins` values.
+
+    One vectorized step per distinct sounding length (usually one per channel). max and mean combine the samples of a
+    bin (mean rounded to the nearest integer), nearest takes the sample in the middle of the bin.
+    Returns (uint8 matrix frames x bins, lengths: bins or 0 for empty payloads).
+    """
+    reduced = np.zeros((len(soundings), bins), dtype=np.uint8)
+    distinct = np.unique(lengths).tolist()
+    for length in distinct:
+        if length == 0:
+            continue
+        rows = slice(None) if len(distinct) == 1 else lengths == length
+        block = soundings[rows, :length]
+        starts, counts, centers = _sounding_bins(length, bins)
+        if reduction == "nearest":
+            reduced[rows] = block[:, centers]
+        elif reduction == "max":
+            reduced[rows] = np.maximum.reduceat(block, starts, axis=1)
+        else:
+            reduced[rows] = (np.add.reduceat(block, starts, axis=1, dtype=np.uint32) + counts // 2) // counts
+    return reduced, np.where(lengths > 0, bins, 0).astype(np.int32)
+
+
+def __getattr__(name):
+    # the dtypes are built on first access, so that importing the module does not import NumPy
+    if name == "FRAME_HEADER_DTYPE":
+        return frame_header_dtype()
+    if name == "FRAME_INDEX_DTYPE":
+        return frame_index_dtype()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class DecoderInstrumentation:
+    """Instrumentation interface of SL2Decoder, this default does nothing.
+
+    While `enabled` is False the decoder does not even take timestamps, so the default costs nothing in the hot loop.
+    Phases reported by the decoder: header_parse, conversion, sounding_extraction, serialization.
+    """
+    enabled = False
+
+    def start_run(self, filepath):
+        pass
+
+    def end_run(self):
+        pass
+
+    def add_time(self, phase, seconds):
+        pass
+
+    def add_frames(self, frames, nbytes):
+        pass
+
+    def report(self):
+        return {}
+
+
+class PerfInstrumentation(DecoderInstrumentation):
+    """Collects frames/s, bytes/s, time per phase and peak memory of decoder runs and writes them as JSON report."""
+    enabled = True
+
+    def __init__(self):
+        self.phases = {}
+        self.frames = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.files = []
+        self._depth = 0  # runs can be nested, e.g. save_to_csv(decoder.iter_records())
+        self._started = None
+
+    def start_run(self, filepath):
+        if self._depth == 0:
+            self._started = time.perf_counter()
+            if str(filepath) not in self.files:
+                self.files.append(str(filepath))
+        self._depth += 1
+
+    def end_run(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self.seconds += time.perf_counter() - self._started
+
+    def add_time(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_frames(self, frames, nbytes):
+        self.frames += frames
+        self.bytes += nbytes
+
+    def report(self):
+        return {
+            "files": self.files,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 6),
+            "frames_per_s": round(self.frames / self.seconds, 1) if self.seconds else None,
+            "bytes_per_s": round(self.bytes / self.seconds, 1) if self.seconds else None,
+            "phases": {phase: round(seconds, 6) for phase, seconds in self.phases.items()},
+            "peak_memory_bytes": _peak_memory_bytes(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        }
+
+    def write_report(self, output_path):
+        with open(output_path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def _derived_value(name, value):
+    """Value of the derived field `name` for the raw value of its source field."""
+    if name in FLAG_BITS:
+        return bool(value >> FLAG_BITS[name] & 1)
+    return CATEGORY_NAMES[name].get(value, UNKNOWN_CODE_NAME)
+
+
+def _derived_column(name, columns):
+    """Vectorized _derived_value over a whole column, `columns` is a dict of columns or the structured frame headers.
+
+    Flags become bool arrays, channel/frequency names fixed-width strings looked up in a table of all codes.
+    """
+    values = columns[DERIVED_FIELDS[name]]
+    if name in FLAG_BITS:
+        return (values.astype(np.uint16) >> FLAG_BITS[name] & 1).astype(bool)
+    names = CATEGORY_NAMES[name]
+    table = np.array([names.get(code, UNKNOWN_CODE_NAME) for code in range(256)] + [UNKNOWN_CODE_NAME])
+    codes = values.astype(np.int64)
+    return table[np.where((codes >= 0) & (codes < 256), codes, 256)]
+
+
+def _field_column(name, columns):
+    return _derived_column(name, columns) if name in DERIVED_FIELDS else columns[name]
+
+
+def _peak_memory_bytes():
+    """Peak resident memory of this process, None where the resource module is not available (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB on Linux
+
+
+class FrameRecordView(Sequence):
+    """Dict-per-record view on columnar decoded frames, same output as SL2Decoder._decode_record."""
+
+    def __init__(self, frame_headers, frame_offsets, data, names=None, soundings=True, reduce_sounding=None):
+        self.names = FRAME_HEADER_NAMES if names is None else tuple(names)
+        self.header_names = [name for name in self.names if name not in DERIVED_FIELDS]
+        self.frame_headers = frame_headers if names is None else frame_headers[self.header_names]
+        self.derived = {name: _derived_column(name, frame_headers) for name in self.names if name in DERIVED_FIELDS}
+        self.block_sizes = frame_headers["block_size"]
+        self.frame_offsets = frame_offsets
+        self.data = data
+        self.soundings = soundings
+        self.reduce_sounding = reduce_sounding  # SL2Decoder._reduce_sounding with `soundings: bins` in the config
+
+    def __len__(self):
+        return len(self.frame_offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        record = dict(zip(self.header_names, self.frame_headers[index].item()))
+        if self.derived:
+            record.update((name, values[index].item()) for name, values in self.derived.items())
+            record = {name: record[name] for name in self.names}
+        if self.soundings:
+            pos = int(self.frame_offsets[index])
+            sounding_block = self.data[pos + 145:pos + 145 + int(self.block_sizes[index])]
+            record["sounding_data"] = list(sounding_block) if self.reduce_sounding is None else self.reduce_sounding(sounding_block).tolist()
+        return record
+
+
+_frame_range_worker = None  # (SL2Decoder, mmap) of a decode_parallel worker process, see _init_frame_range_worker
+
+
+def _init_frame_range_worker(filepath, config):
+    """Pool initializer of SL2Decoder.decode_parallel: one decoder with the parsed config and one mapping per process."""
+    global _frame_range_worker
+    decoder = SL2Decoder(filepath, verbose=False)
+    decoder.config.update(config)
+    decoder._apply_config()
+    with open(filepath, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _frame_range_worker = (decoder, mm)
+
+
+def _decode_frame_range(offsets):
+    """Worker of SL2Decoder.decode_parallel: gathers the frame headers at the given offsets and applies `filter`.
+
+    Returns the kept FRAME_HEADER_DTYPE rows, their offsets and the rejected frames per filter field.
+    """
+    decoder, mm = _frame_range_worker
+    decoder.rejected_frames = Counter()
+    frame_headers = decoder._gather_frame_headers(mm, offsets)
+    if decoder.filter_plan:
+        keep = decoder._filter_keep(frame_headers)
+        frame_headers, offsets = frame_headers[keep], offsets[keep]
+    return frame_headers, offsets, decoder.rejected_frames
+
+
 class SL2Decoder:
-    def __init__(self, filepath, config_path, verbose=True):
+    def __init__(self, filepath, config_path=None, verbose=True, instrumentation=None):
         self.filepath = filepath
         self.config_path = config_path
         self.verbose = verbose
+        self.instrumentation = instrumentation or DecoderInstrumentation()
         self.records = []
+        self.columns = {}
+        self.frame_offsets = None
+        self.index = None
+        self.index_path = Path(f"{filepath}.idx")
+        self.follow_pos = None  # byte offset of the first frame not yet decoded in follow mode
+        self.follow_frames = 0
         self.POLAR_EARTH_RADIUS = 6356752.3142  #radius for the conversion of Spherical Mercator coordinates to WGS84 coordinates
         self.config = {
             # Default conversion factors
@@ -29,28 +401,128 @@ class SL2Decoder:
             "speed_conversion": 1.0,
             "convert_coordinates": False,
             "include_raw": False,
+            "fields": None,  # None: decode all fields
+            "filter": None,  # None: keep all frames
+            "sounding_bins": None,  # None: all samples of the sounding payload
+            "sounding_reduction": "max",
         }
+        self.rejected_frames = Counter()  # rejected frames per filter field
+        self.skipped_ranges = []  # (start, end) byte ranges skipped in recover mode
+        self.channel_arrays = {}  # {channel: (columns, soundings)} of demux_channels()
         self._load_config()
 
     def _load_config(self):
-        """Lädt die Konfigurationswerte aus einer YAML-Datei."""
-        with open(self.config_path, 'r') as file:
-            config_data = yaml.safe_load(file)
-            units = config_data.get("units", {})
+        """Lädt die Konfigurationswerte aus einer YAML-Datei. Without config_path the defaults apply (raw values, all fields)."""
+        config_data = {}
+        if self.config_path is not None:
+            import yaml
+            with open(self.config_path, 'r') as file:
+                config_data = yaml.safe_load(file) or {}
+        units = config_data.get("units") or {}
 
-            self.config["distance_conversion"] = 0.3048 if units.get("distance") == "meter" else 1.0
-            self.config["speed_conversion"] = 1.852 if units.get("speed") == "kmh" else 1.0
-            self.config["convert_coordinates"] = units.get("coordinates") == "wgs84"
-            self.config["include_raw"] = units.get("include_raw", False)
+        self.config["distance_conversion"] = 0.3048 if units.get("distance") == "meter" else 1.0
+        self.config["speed_conversion"] = 1.852 if units.get("speed") == "kmh" else 1.0
+        self.config["convert_coordinates"] = units.get("coordinates") == "wgs84"
+        self.config["include_raw"] = units.get("include_raw", False)
+        self.config["fields"] = config_data.get("fields")
+        self.config["filter"] = config_data.get("filter")
+        soundings = config_data.get("soundings") or {}
+        self.config["sounding_bins"] = soundings.get("bins")
+        self.config["sounding_reduction"] = soundings.get("reduction", "max")
+        self._apply_config()
 
-    def decode(self):
+    def _apply_config(self):
+        """Checks self.config and prepares the field and filter plans from it."""
+        bins = self.config["sounding_bins"]
+        if bins is not None and (not isinstance(bins, int) or bins < 1):
+            raise ValueError(f"Invalid sounding bins in config: {bins}")
+        if self.config["sounding_reduction"] not in SOUNDING_REDUCTIONS:
+            raise ValueError(f"Unknown sounding reduction in config: {self.config['sounding_reduction']}")
+        self.sounding_columns = CSV_SOUNDING_COLUMNS if bins is None else bins  # sounding columns of CSV and binary output
 
-        with open(self.filepath, 'rb') as f:
-            data = f.read()
+        self._build_field_plan()
+        self._build_filter_plan()
+
+    def _build_field_plan(self):
+        """Prepares the unpackers for the header fields selected with `fields:` in the config."""
+        fields = self.config["fields"]
+        self.decode_soundings = fields is None or "sounding_data" in fields
+        if fields is None:
+            self.header_fields = list(FRAME_HEADER_NAMES)
+            self.field_plan = None
+            return
 
+        unknown = [name for name in fields if name != "sounding_data" and self._field_layout(name) is None]
+        if unknown:
+            raise ValueError(f"Unknown fields in config: {unknown}")
+        self.header_fields = [name for name in fields if name != "sounding_data"]
+        self.field_plan = [(name, *self._field_layout(name)) for name in self.header_fields]
+
+    def _field_layout(self, name):
+        """(offset, unpacker, derived) of a header or derived field, derived is False for header fields."""
+        layout = {field: (offset, fmt) for field, offset, fmt in FRAME_HEADER_FIELDS}
+        source = DERIVED_FIELDS.get(name, name)
+        if source not in layout:
+            return None
+        offset, fmt = layout[source]
+        return offset, struct.Struct(fmt), name in DERIVED_FIELDS
+
+    def _build_filter_plan(self):
+        """Prepares the frame filter from `filter:` in the config: {field: value | [values] | {min: .., max: ..}}."""
+        rules = self.config["filter"] or {}
+        unknown = [name for name in rules if self._field_layout(name) is None]
+        if unknown:
+            raise ValueError(f"Unknown filter fields in config: {unknown}")
+        for name, rule in rules.items():
+            if isinstance(rule, dict) and (not rule or set(rule) - FILTER_RANGE_KEYS):
+                raise ValueError(f"Invalid filter range for {name} in config: {rule} (use min and/or max)")
+        self.filter_plan = []
+        for name, rule in rules.items():
+            offset, unpacker, derived = self._field_layout(name)
+            predicate = self._filter_predicate(rule)
+            if derived:  # e.g. PositionValid: true is checked on the two flag bytes, before anything is decoded
+                predicate = lambda value, name=name, predicate=predicate: predicate(_derived_value(name, value))
+            self.filter_plan.append((name, offset, unpacker, predicate))
+
+    def _filter_predicate(self, rule):
+        if isinstance(rule, dict):
+            low, high = rule.get("min"), rule.get("max")
+            return lambda value: (low is None or value >= low) and (high is None or value <= high)
+        if isinstance(rule, list):
+            return set(rule).__contains__
+        return lambda value: value == rule
+
+    def _filter_mask(self, values, rule):
+        """Vectorized form of _filter_predicate for a whole column."""
+        if isinstance(rule, dict):
+            mask = np.ones(len(values), dtype=bool)
+            if rule.get("min") is not None:
+                mask &= values >= rule["min"]
+            if rule.get("max") is not None:
+                mask &= values <= rule["max"]
+            return mask
+        if isinstance(rule, list):
+            return np.isin(values, rule)
+        return values == rule
+
+    def _reject_frame(self, data, pos):
+        """Returns the first filter field the frame at pos fails, None if the frame is kept."""
+        if pos + FRAME_HEADER_SIZE > len(data):
+            raise struct.error(f"unpack requires a buffer of {FRAME_HEADER_SIZE} bytes")
+        for name, offset, unpacker, predicate in self.filter_plan:
+            if not predicate(unpacker.unpack_from(data, pos + offset)[0]):
+                return name
+        return None
+
+    def _report_rejected_frames(self):
+        if self.verbose and self.filter_plan:
+            print(f"\nRejected frames: {sum(self.rejected_frames.values())} {dict(self.rejected_frames)}")
+
+    def _read_file_header(self, data):
+        """Validates the file header and prints the general information of the recording."""
         pos = 0
-        header = data[pos:pos + 10]
-        pos += 10 # skip the header, sources are not clear about this value
+        header = data[pos:pos + FILE_HEADER_SIZE]
+        pos += FILE_HEADER_SIZE # skip the header, sources are not clear about this value
 
         # Decode the header
         file_format = struct.unpack('<H', header[0:2])[0]
@@ -64,7 +536,7 @@ class SL2Decoder:
             raise ValueError("Block size is not 'downscan' or 'sidescan'; Likely not an SLG/SL2/SL3 file")
         
         time1_raw = struct.unpack('<I', data[pos + 60:pos + 64])[0] # seconds since 1980 (GPS Time)
-        time1_utc = time1_raw - 315964800 # subtract 315964800 seconds to get time since 1970 (UTC)
+        time1_utc = time1_raw - GPS_EPOCH_OFFSET # subtract 315964800 seconds to get time since 1970 (UTC)
         time1_iso = datetime.fromtimestamp(time1_utc, tz=timezone.utc)
         
 
@@ -74,25 +546,782 @@ class SL2Decoder:
             print(f"Time since 1970: {time1_utc}")
             print(f"Date and time of measurement: {time1_iso.isoformat()}")
 
+    def decode(self, recover=False):
+        """Decodes all frames into self.records.
+
+        With recover=True every frame header is checked for plausibility; after a damaged frame the decoder scans forward
+        to the next plausible header instead of stopping. The skipped byte ranges are collected in self.skipped_ranges.
+        """
+        self.instrumentation.start_run(self.filepath)
+        with open(self.filepath, 'rb') as f:
+            data = f.read()
+
+        self._read_file_header(data)
+        pos = FILE_HEADER_SIZE
+        frame_state = {}
+        frames = len(self.records)
+
         # Read the records
         while pos < len(data):
-            if self.verbose and (len(self.records) % 100 == 0):
-                print('.', end='', flush=True)
+            if recover:
+                if not self._plausible_frame(data, pos, frame_state):
+                    pos = self._resync(data, pos, frame_state)
+                    if pos is None:
+                        break
+                self._update_frame_state(data, pos, frame_state)
             try:
                 block_size = struct.unpack('<H', data[pos + 28:pos + 30])[0]
                 packet_size = struct.unpack('<H', data[pos + 34:pos + 36])[0]
-                record = self._decode_record(data, pos, block_size)
-                self.records.append(record)
+                rejected_by = self._reject_frame(data, pos) if self.filter_plan else None
+                if rejected_by is None:
+                    record = self._decode_record(data, pos, block_size)
+                    self.records.append(record)
+                else:
+                    self.rejected_frames[rejected_by] += 1
                 pos += packet_size + 144
             except (struct.error, IndexError) as e:
                 print(f"Error decoding record: {e}")
                 break
         
+        self.instrumentation.add_frames(len(self.records) - frames, min(pos, len(data)) - FILE_HEADER_SIZE)
+        self.instrumentation.end_run()
+        self._report_rejected_frames()
         if self.verbose:
             print("\nDecoding completed.")    
+
+    def iter_records(self, recover=False):
+        """Yields the decoded frames one at a time from a memory-mapped file, without collecting them in self.records.
+
+        `sounding_data` is handed out as a memoryview slice of the mapping instead of a list copy (as uint8 array with
+        `soundings: bins` in the config).
+        It is only valid while the generator is running; copy it (bytes(...)) if it has to be kept.
+        recover=True skips damaged ranges like decode(recover=True).
+        """
+        self.instrumentation.start_run(self.filepath)
+        with open(self.filepath, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(mm)
+        record = None
+        pos = FILE_HEADER_SIZE
+        frames = 0
+        try:
+            self._read_file_header(data)
+            frame_state = {}
+
+            while pos < len(data):
+                if recover:
+                    if not self._plausible_frame(data, pos, frame_state):
+                        pos = self._resync(data, pos, frame_state)
+                        if pos is None:
+                            break
+                    self._update_frame_state(data, pos, frame_state)
+                try:
+                    block_size = struct.unpack('<H', data[pos + 28:pos + 30])[0]
+                    packet_size = struct.unpack('<H', data[pos + 34:pos + 36])[0]
+                    rejected_by = self._reject_frame(data, pos) if self.filter_plan else None
+                    if rejected_by is None:
+                        record = self._decode_record(data, pos, block_size, sounding_view=True)
+                except (struct.error, IndexError) as e:
+                    print(f"Error decoding record: {e}")
+                    break
+                if rejected_by is None:
+                    frames += 1
+                    yield record
+                else:
+                    self.rejected_frames[rejected_by] += 1
+                pos += packet_size + 144
+            self._report_rejected_frames()
+        finally:
+            self.instrumentation.add_frames(frames, min(pos, len(data)) - FILE_HEADER_SIZE)
+            self.instrumentation.end_run()
+            record = None
+            data.release()
+            try:
+                mm.close()
+            except BufferError:
+                pass # the caller still holds sounding slices, the mapping is closed once they are released
+
+    def _plausible_frame(self, data, pos, state):
+        """Checks the invariants of a frame header at pos against the previous frames (state)."""
+        if pos + FRAME_HEADER_SIZE > len(data):
+            return False
+        block_size, _, _, packet_size, frame_index = RESYNC_STRUCT.unpack_from(data, pos + 28)
+        if block_size not in RESYNC_BLOCK_SIZES or not 0 < packet_size <= block_size:
+            return False
+        if state.get("packet_sizes", {}).get(block_size, packet_size) != packet_size:
+            return False
+        if "frame_index" in state:
+            time_offset = struct.unpack_from('<i', data, pos + 140)[0]
+            if frame_index < state["frame_index"] or time_offset < state["time_offset"]:
+                return False
+        return True
+
+    def _update_frame_state(self, data, pos, state):
+        block_size, _, _, packet_size, frame_index = RESYNC_STRUCT.unpack_from(data, pos + 28)
+        state.setdefault("packet_sizes", {})[block_size] = packet_size
+        state["pos"] = pos
+        state["frame_index"] = frame_index
+        state["time_offset"] = struct.unpack_from('<i', data, pos + 140)[0]
+
+    def _chains(self, data, pos):
+        """True if the frame at pos is followed by another plausible block size or the end of the file."""
+        next_pos = pos + PACKET_SIZE_STRUCT.unpack_from(data, pos + 34)[0] + FRAME_HEADER_SIZE
+        if next_pos + FRAME_HEADER_SIZE > len(data):
+            return True
+        return PACKET_SIZE_STRUCT.unpack_from(data, next_pos + 28)[0] in RESYNC_BLOCK_SIZES
+
+    def find_next_frame(self, data, start, state=None, chunk_size=RESYNC_CHUNK_SIZE):
+        """Returns the offset of the next plausible frame header at or after start, None if there is none.
+
+        The candidates are searched vectorized over the buffer: every byte position whose block_size (+28) is one of
+        RESYNC_BLOCK_SIZES and whose packet_size (+34) fits into the block. Only these few are checked one by one.
+        """
+        state = {} if state is None else state
+        raw = np.frombuffer(data, dtype=np.uint8)
+        last = len(raw) - FRAME_HEADER_SIZE  # last possible start of a header
+        for chunk_start in range(start, last + 1, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, last + 1)
+            block_bytes = raw[chunk_start + 28:chunk_end + 29].astype(np.uint16)
+            packet_bytes = raw[chunk_start + 34:chunk_end + 35].astype(np.uint16)
+            block_sizes = block_bytes[:-1] | (block_bytes[1:] << 8)
+            packet_sizes = packet_bytes[:-1] | (packet_bytes[1:] << 8)
+            candidates = np.flatnonzero(np.isin(block_sizes, RESYNC_BLOCK_SIZES) & (packet_sizes > 0) & (packet_sizes <= block_sizes))
+            for candidate in candidates + chunk_start:
+                candidate = int(candidate)
+                if self._plausible_frame(data, candidate, state) and self._chains(data, candidate):
+                    return candidate
+        return None
+
+    def _resync(self, data, pos, state):
+        """Skips the damaged bytes from pos to the next plausible frame, returns its offset or None at the end.
+
+        The search starts right behind the header of the last good frame, in case that frame itself was cut short.
+        """
+        next_pos = self.find_next_frame(data, state.get("pos", pos) + FRAME_HEADER_SIZE if "pos" in state else pos + 1, state)
+        end = len(data) if next_pos is None else next_pos
+        if end > pos:
+            self.skipped_ranges.append((pos, end))
+            if self.verbose:
+                print(f"\nSkipped damaged bytes {pos}-{end} ({end - pos} bytes)")
+        return next_pos
+
+    def decode_parallel(self, num_processes=None, chunk_size=None):
+        """Decodes the file on a process pool, self.records holds the same dicts as after decode().
+
+        A boundary scan first collects the frame offsets. The workers gather the frame headers of their offset ranges
+        as FRAME_HEADER_DTYPE rows and apply `filter`, only these rows go back. The parent concatenates them in file
+        order into self.columns and a FrameRecordView like decode_columns(), instead of unpickling a dict per frame.
+        The workers get the parsed config once per process, the YAML is not read again.
+        """
+        if num_processes is None:
+            num_processes = cpu_count()  # Use the available CPU cores
+
+        self.instrumentation.start_run(self.filepath)
+        with open(self.filepath, 'rb') as f:
+            data = f.read()
+        self._read_file_header(data)
+        offsets = self._scan_frame_offsets(data, FILE_HEADER_SIZE)
+
+        if chunk_size is None:
+            chunk_size = max(1, -(-len(offsets) // (num_processes * 4)))  # a few chunks per worker to balance the load
+        chunks = [offsets[i:i + chunk_size] for i in range(0, len(offsets), chunk_size)]
+
+        header_chunks = [np.zeros(0, dtype=frame_header_dtype())]
+        offset_chunks = [np.zeros(0, dtype=np.int64)]
+        with self._timed("header_parse"):
+            with Pool(processes=num_processes, initializer=_init_frame_range_worker, initargs=(self.filepath, self.config)) as pool:
+                for frame_headers, frame_offsets, rejected_frames in pool.imap(_decode_frame_range, chunks):
+                    self.rejected_frames.update(rejected_frames)
+                    header_chunks.append(frame_headers)
+                    offset_chunks.append(frame_offsets)
+        frame_headers = np.concatenate(header_chunks)
+        offsets = np.concatenate(offset_chunks)
+
+        self.frame_offsets = offsets
+        self.columns = self._header_columns(frame_headers)
+        names = None if self.field_plan is None else self.header_fields
+        reduce_sounding = None if self.config["sounding_bins"] is None else self._reduce_sounding
+        self.records = FrameRecordView(frame_headers, offsets, data, names, self.decode_soundings, reduce_sounding)
+
+        self.instrumentation.add_frames(len(offsets), len(data) - FILE_HEADER_SIZE)
+        self.instrumentation.end_run()
+        self._report_rejected_frames()
+        if self.verbose:
+            print("\nDecoding completed.")
+
+    def decode_new_frames(self, final=False):
+        """Decodes the complete frames appended since the last call (tail-follow of a growing recording).
+
+        A frame counts as complete once its packet is in the file, the sounding is clipped at the end of the file
+        like in decode(). With final=True (recording is finished) a last frame with a cut off packet is decoded too,
+        as long as its frame header is complete.
+        """
+        mm, offsets = self._map_new_frames(final)
+        if mm is None:
+            return []
+        self.instrumentation.start_run(self.filepath)
+        try:
+            records = [self._decode_record(mm, pos, 0) for pos in offsets]
+        finally:
+            mm.close()
+            self.instrumentation.end_run()
+        self.instrumentation.add_frames(len(records), 0)
+        self.follow_frames += len(records)
+        return records
+
+    def _map_new_frames(self, final):
+        """Maps the file and returns it with the offsets of the new complete (and accepted) frames.
+
+        Advances self.follow_pos behind these frames, but never beyond the end of the file.
+        Returns (None, []) if there is nothing new.
+        """
+        with open(self.filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if self.follow_pos is None:
+                if size < FILE_HEADER_SIZE + FRAME_HEADER_SIZE:
+                    return None, []
+                self._read_file_header(f.read(FILE_HEADER_SIZE + FRAME_HEADER_SIZE))
+                self.follow_pos = FILE_HEADER_SIZE
+            if size < self.follow_pos + FRAME_HEADER_SIZE:
+                return None, []
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offsets = []
+        pos = self.follow_pos
+        while pos + FRAME_HEADER_SIZE <= size:
+            next_pos = pos + PACKET_SIZE_STRUCT.unpack_from(mm, pos + 34)[0] + FRAME_HEADER_SIZE
+            if next_pos > size and not final:
+                break  # frame is still being written
+            rejected_by = self._reject_frame(mm, pos) if self.filter_plan else None
+            if rejected_by is None:
+                offsets.append(pos)
+            else:
+                self.rejected_frames[rejected_by] += 1
+            pos = next_pos
+        self.follow_pos = min(pos, size)
+        return mm, offsets
+
+    def follow(self, output_path, output_format="csv", checkpoint_path=None, poll_interval=1.0, idle_timeout=None):
+        """Follows a growing recording and appends the new frames to the output on every poll.
+
+        output_format "csv" appends rows to output_path. "binary" appends the raw frame headers to
+        <output_path>.headers (np.fromfile(..., dtype=FRAME_HEADER_DTYPE)) and the soundings, zero padded to
+        CSV_SOUNDING_COLUMNS bytes (or `soundings: bins`), to <output_path>.soundings
+        (np.fromfile(..., np.uint8).reshape(-1, decoder.sounding_columns)).
+        The checkpoint (default <output_path>.checkpoint.json) stores the position in the recording and the output sizes,
+        so a restart resumes there. After idle_timeout seconds without new data (None: never) the recording counts as
+        finished: the remaining frames are flushed like in decode_new_frames(final=True) and follow() returns.
+        """
+        if output_format == "csv":
+            outputs = [Path(output_path)]
+        elif output_format == "binary":
+            outputs = [Path(f"{output_path}.headers"), Path(f"{output_path}.soundings")]
+        else:
+            raise ValueError(f"Unknown output format: {output_format}")
+        checkpoint_path = Path(checkpoint_path or f"{output_path}.checkpoint.json")
+        self._load_checkpoint(checkpoint_path, outputs)
+
+        last_data = time.monotonic()
+        while True:
+            idle = idle_timeout is not None and time.monotonic() - last_data >= idle_timeout
+            mm, offsets = self._map_new_frames(final=idle)
+            if mm is not None:
+                try:
+                    if offsets:
+                        if output_format == "csv":
+                            self.save_to_csv(output_path, (self._decode_record(mm, pos, 0, sounding_view=True) for pos in offsets), append=True)
+                        else:
+                            self._append_binary_frames(mm, offsets, outputs)
+                        self.follow_frames += len(offsets)
+                        last_data = time.monotonic()
+                finally:
+                    mm.close()
+                self._save_checkpoint(checkpoint_path, outputs)
+            if idle:
+                self._report_rejected_frames()
+                return
+            time.sleep(poll_interval)
+
+    def _append_binary_frames(self, mm, offsets, outputs):
+        headers_path, soundings_path = outputs
+        with open(headers_path, 'ab') as f:
+            for pos in offsets:
+                f.write(mm[pos:pos + FRAME_HEADER_SIZE])
+        if not self.decode_soundings:
+            return
+        with open(soundings_path, 'ab', buffering=CSV_WRITE_BUFFER) as f:
+            for pos in offsets:
+                block_size = struct.unpack_from('<h', mm, pos + 28)[0]
+                payload = mm[pos + 145:pos + 145 + block_size]
+                if self.config["sounding_bins"] is not None:
+                    payload = self._reduce_sounding(payload).tobytes()
+                f.write(payload[:self.sounding_columns].ljust(self.sounding_columns, b'\x00'))
+
+    def _load_checkpoint(self, checkpoint_path, outputs):
+        """Resumes from the checkpoint and cuts the outputs back to the state it describes.
+
+        Refuses to start if the checkpoint does not fit the recording, the outputs are left untouched then.
+        """
+        checkpoint = None
+        if checkpoint_path.exists():
+            with open(checkpoint_path, 'r') as f:
+                checkpoint = json.load(f)
+            if checkpoint["offset"] > os.path.getsize(self.filepath):
+                raise ValueError(f"Checkpoint {checkpoint_path} is beyond the end of {self.filepath}; "
+                                 f"remove it (and the outputs) to start over")
+
+        if checkpoint is None:
+            self.follow_pos = None
+            self.follow_frames = 0
+            sizes = {}
+        else:
+            self.follow_pos = checkpoint["offset"]
+            self.follow_frames = checkpoint["frames"]
+            sizes = checkpoint["output_sizes"]
+        for output in outputs:
+            if output.exists():
+                with open(output, 'r+b') as f:
+                    f.truncate(sizes.get(str(output), 0))
+
+    def _save_checkpoint(self, checkpoint_path, outputs):
+        checkpoint = {
+            "filepath": str(self.filepath),
+            "offset": self.follow_pos,
+            "frames": self.follow_frames,
+            "output_sizes": {str(output): output.stat().st_size if output.exists() else 0 for output in outputs},
+        }
+        tmp_path = checkpoint_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, checkpoint_path)
+
+    def decode_columns(self):
+        """Decodes all frame headers in bulk into columnar NumPy arrays (self.columns).
+
+        self.records is replaced by a FrameRecordView, which builds the same dicts as decode() on access.
+        """
+        self.instrumentation.start_run(self.filepath)
+        with open(self.filepath, 'rb') as f:
+            data = f.read()
+
+        self._read_file_header(data)
+        timing = self.instrumentation.enabled
+        if timing:
+            started = time.perf_counter()
+        offsets = self._scan_frame_offsets(data, FILE_HEADER_SIZE)
+        frame_headers = self._gather_frame_headers(data, offsets)
+        if timing:
+            self.instrumentation.add_time("header_parse", time.perf_counter() - started)
+        self.instrumentation.add_frames(len(offsets), len(data) - FILE_HEADER_SIZE)
+        frame_headers, offsets = self._filter_frames(frame_headers, offsets)
+
+        self.frame_offsets = offsets
+        self.columns = self._header_columns(frame_headers)
+        names = None if self.field_plan is None else self.header_fields
+        reduce_sounding = None if self.config["sounding_bins"] is None else self._reduce_sounding
+        self.records = FrameRecordView(frame_headers, offsets, data, names, self.decode_soundings, reduce_sounding)
+        self.instrumentation.end_run()
+
+        if self.verbose:
+            print(f"Decoded {len(offsets)} frames.")
+        return self.columns
+
+    def _filter_frames(self, frame_headers, offsets, report=True):
+        """Applies `filter` of the config to bulk decoded frame headers, returns the kept (frame_headers, offsets)."""
+        if not self.filter_plan:
+            return frame_headers, offsets
+        keep = self._filter_keep(frame_headers)
+        if report:
+            self._report_rejected_frames()
+        return frame_headers[keep], offsets[keep]
+
+    def _filter_keep(self, frame_headers):
+        """Boolean mask of the bulk decoded frame headers that pass `filter`, the rejected ones are counted per field."""
+        keep = np.ones(len(frame_headers), dtype=bool)
+        for name, rule in (self.config["filter"] or {}).items():
+            passed = self._filter_mask(_field_column(name, frame_headers), rule)
+            rejected = int(np.count_nonzero(keep & ~passed))  # counted at the first failing field
+            if rejected:
+                self.rejected_frames[name] += rejected
+            keep &= passed
+        return keep
+
+    def iter_batches(self, batch_frames=4096, channels=None):
+        """Yields (columns, soundings) like to_arrays() for batch_frames frames at a time, in file order.
+
+        The file is memory-mapped and only one batch is held in memory, so the memory use does not grow with the
+        recording. With `channels` (codes or names like in demux_channels) only these channels are yielded, batches
+        can then be shorter. The config filter is applied, the rejected frames are reported at the end.
+        """
+        wanted = None if channels is None else [self._channel_code(channel) for channel in channels]
+        self.instrumentation.start_run(self.filepath)
+        with open(self.filepath, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        raw = np.frombuffer(mm, dtype=np.uint8)
+        try:
+            self._read_file_header(mm)
+            for frame_headers, offsets, pos in self._iter_frame_headers(mm, FILE_HEADER_SIZE, batch_frames):
+                self.instrumentation.add_frames(len(offsets), min(pos, len(mm)) - int(offsets[0]))
+                frame_headers, offsets = self._filter_frames(frame_headers, offsets, report=False)
+                if wanted is not None:
+                    selected = np.isin(frame_headers["channel"], wanted)
+                    frame_headers, offsets = frame_headers[selected], offsets[selected]
+                if not len(offsets):
+                    continue
+                columns = self._header_columns(frame_headers)
+                soundings = None
+                if self.decode_soundings:
+                    with self._timed("sounding_extraction"):
+                        soundings, columns["sounding_length"] = self._gather_soundings(raw, offsets, frame_headers["block_size"])
+                yield columns, soundings
+            self._report_rejected_frames()
+        finally:
+            self.instrumentation.end_run()
+            del raw
+            mm.close()
+
+    def _iter_frame_headers(self, mm, pos, batch_frames):
+        """Yields (frame_headers, offsets, next_pos) of batch_frames frames at a time from pos on, without the filter.
+
+        next_pos is the offset behind the last frame of the batch. The pages of the memory map before a batch are
+        released once the next batch is requested, otherwise they stay in the resident memory.
+        """
+        while True:
+            offsets = self._scan_frame_offsets(mm, pos, batch_frames)
+            if not len(offsets):
+                return
+            pos = int(offsets[-1]) + PACKET_SIZE_STRUCT.unpack_from(mm, int(offsets[-1]) + 34)[0] + FRAME_HEADER_SIZE
+            yield self._gather_frame_headers(mm, offsets), offsets, pos
+            done = int(offsets[0]) // mmap.PAGESIZE * mmap.PAGESIZE
+            if done and hasattr(mmap, "MADV_DONTNEED"):
+                mm.madvise(mmap.MADV_DONTNEED, 0, done)
+
+    def _header_columns(self, frame_headers):
+        """The output columns of bulk decoded frame headers, with the derived columns when `fields` is not set."""
+        columns = {name: np.ascontiguousarray(_field_column(name, frame_headers)) for name in self.header_fields}
+        if self.field_plan is None:
+            columns.update((name, _derived_column(name, frame_headers)) for name in DERIVED_FIELDS)
+        return columns
+
+    def demux_channels(self, channels=None, convert=False):
+        """Splits the frames by `channel` into one columnar store per channel, in a single pass over the file.
+
+        Returns {channel: (columns, soundings)} (also kept in self.channel_arrays) with the same columns as
+        to_arrays() and the soundings of every channel as its own contiguous uint8 matrix. With `channels` (codes or
+        names like "left", "right", "downscan") only these channels are kept and the payloads of the others are never
+        read, the file is memory-mapped.
+        """
+        wanted = None if channels is None else [self._channel_code(channel) for channel in channels]
+        self.instrumentation.start_run(self.filepath)
+        with open(self.filepath, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_file_header(mm)
+            self.channel_arrays = self._demux(mm, wanted, convert)
+        finally:
+            mm.close()
+        self.instrumentation.end_run()
+        return self.channel_arrays
+
+    def _demux(self, data, wanted, convert):
+        # All arrays returned from here are copies, so the caller can close the memory map afterwards
+        timing = self.instrumentation.enabled
+        if timing:
+            started = time.perf_counter()
+        offsets = self._scan_frame_offsets(data, FILE_HEADER_SIZE)
+        frame_headers = self._gather_frame_headers(data, offsets)
+        if timing:
+            self.instrumentation.add_time("header_parse", time.perf_counter() - started)
+        self.instrumentation.add_frames(len(offsets), len(data) - FILE_HEADER_SIZE)
+        frame_headers, offsets = self._filter_frames(frame_headers, offsets)
+
+        codes = frame_headers["channel"]
+        if wanted is not None:
+            selected = np.isin(codes, wanted)
+            frame_headers, offsets, codes = frame_headers[selected], offsets[selected], codes[selected]
+        order = np.argsort(codes, kind="stable")  # frames of a channel stay in file order
+        channel_codes, starts = np.unique(codes[order], return_index=True)
+        raw = np.frombuffer(data, dtype=np.uint8)
+
+        channel_arrays = {}
+        for code, start, stop in zip(channel_codes.tolist(), starts, [*starts[1:], len(order)]):
+            rows = order[start:stop]
+            channel_headers = frame_headers[rows]
+            columns = self._header_columns(channel_headers)
+            if convert:
+                with self._timed("conversion"):
+                    columns = self.convert_columns(columns)
+            soundings = None
+            if self.decode_soundings:
+                with self._timed("sounding_extraction"):
+                    soundings, columns["sounding_length"] = self._gather_soundings(raw, offsets[rows], channel_headers["block_size"])
+            channel_arrays[code] = (columns, soundings)
+
+        if self.verbose:
+            counts = {_derived_value("channel_name", code): int(stop - start)
+                      for code, start, stop in zip(channel_codes.tolist(), starts, [*starts[1:], len(order)])}
+            print(f"Demultiplexed frames per channel: {counts}")
+        return channel_arrays
+
+    def _gather_soundings(self, raw, offsets, block_sizes):
+        """Copies the sounding payloads at the given frame offsets into one contiguous matrix, same rows as to_arrays.
+
+        With `soundings: bins` in the config the payloads are reduced to that many values, GATHER_CHUNK_FRAMES frames
+        at a time, so the matrix in full resolution is never built for the whole file.
+        """
+        bins = self.config["sounding_bins"]
+        if bins is None:
+            return self._gather_payloads(raw, offsets, block_sizes)
+        soundings = np.zeros((len(offsets), bins), dtype=np.uint8)
+        lengths = np.zeros(len(offsets), dtype=np.int32)
+        for start in range(0, len(offsets), GATHER_CHUNK_FRAMES):
+            chunk = slice(start, start + GATHER_CHUNK_FRAMES)
+            payloads, payload_lengths = self._gather_payloads(raw, offsets[chunk], block_sizes[chunk])
+            soundings[chunk], lengths[chunk] = reduce_soundings(payloads, payload_lengths, bins, self.config["sounding_reduction"])
+        return soundings, lengths
+
+    def _reduce_sounding(self, data_block):
+        """One sounding payload reduced to `soundings: bins` values (uint8 array), see reduce_soundings."""
+        values = np.frombuffer(data_block, dtype=np.uint8)
+        reduced, _ = reduce_soundings(values[None, :], np.array([len(values)]), self.config["sounding_bins"], self.config["sounding_reduction"])
+        return reduced[0]
+
+    def _gather_payloads(self, raw, offsets, block_sizes):
+        """The payloads of _gather_soundings in full resolution, shorter ones padded with 0."""
+        starts = offsets.astype(np.int64) + 145
+        lengths = np.clip(np.minimum(block_sizes.astype(np.int64), len(raw) - starts), 0, None).astype(np.int32)
+        width = int(lengths.max(initial=0))
+        soundings = np.zeros((len(starts), width), dtype=np.uint8)
+        if width:
+            complete = starts + width <= len(raw)
+            soundings[complete] = np.lib.stride_tricks.sliding_window_view(raw, width)[starts[complete]]
+            for row in np.flatnonzero(~complete):  # the last frames of the file
+                soundings[row, :lengths[row]] = raw[starts[row]:starts[row] + lengths[row]]
+            if np.any(lengths < width):
+                soundings[np.arange(width) >= lengths[:, None]] = 0
+        return soundings, lengths
+
+    def _channel_code(self, channel):
+        """Channel code of a code or (part of) a channel name, e.g. "left" -> 3."""
+        if not isinstance(channel, str):
+            return int(channel)
+        matches = [code for code, name in CHANNEL_NAMES.items() if channel.lower() in name.lower()]
+        if len(matches) != 1:
+            raise ValueError(f"Unknown or ambiguous channel: {channel}")
+        return matches[0]
+
+    def save_channels_to_npy(self, output_dir, channels=None, convert=False):
+        """Speichert jeden Kanal als eigenes Verzeichnis channel_<code> mit einer .npy-Datei pro Spalte und `soundings.npy`."""
+        output_dir = Path(output_dir)
+        channel_arrays = self.demux_channels(channels, convert)
+        with self._timed("serialization"):
+            for code, (columns, soundings) in channel_arrays.items():
+                channel_dir = output_dir / f"channel_{code}"
+                channel_dir.mkdir(parents=True, exist_ok=True)
+                for name, values in columns.items():
+                    np.save(channel_dir / f"{name}.npy", values)
+                if soundings is not None:
+                    np.save(channel_dir / "soundings.npy", soundings)
+        return channel_arrays
+
+    def load_index(self, rebuild=False):
+        """Returns the frame index of the file, read from the sidecar if it is up to date, otherwise built and saved."""
+        if self.index is not None and not rebuild:
+            return self.index
+
+        stat = os.stat(self.filepath)
+        index = None if rebuild else self._read_index(stat)
+        if index is None:
+            index = self.build_index()
+            self._write_index(index, stat)
+        self.index = index
+        return index
+
+    def build_index(self):
+        """Scans the file once and collects offset, channel, frame_index, time_offset and packet_size of every frame."""
+        with open(self.filepath, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            offsets = self._scan_frame_offsets(mm, FILE_HEADER_SIZE)
+            frame_headers = self._gather_frame_headers(mm, offsets)
+        finally:
+            mm.close()
+
+        index = np.empty(len(offsets), dtype=frame_index_dtype())
+        index["offset"] = offsets
+        for name in ("channel", "frame_index", "time_offset", "packet_size"):
+            index[name] = frame_headers[name]
+        return index
+
+    def _read_index(self, stat):
+        """Reads the sidecar index, returns None if it is missing or belongs to another version of the file."""
+        try:
+            with open(self.index_path, 'rb') as f:
+                magic, version, file_size, mtime_ns, count = INDEX_HEADER_STRUCT.unpack(f.read(INDEX_HEADER_STRUCT.size))
+                if (magic, version, file_size, mtime_ns) != (INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns):
+                    return None
+                index = np.fromfile(f, dtype=frame_index_dtype(), count=count)
+        except (OSError, struct.error):
+            return None
+        return index if len(index) == count else None
+
+    def _write_index(self, index, stat):
+        try:
+            with open(self.index_path, 'wb') as f:
+                f.write(INDEX_HEADER_STRUCT.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns, len(index)))
+                index.tofile(f)
+        except OSError as e:
+            print(f"Could not save frame index {self.index_path}: {e}")
+
+    def get_frame(self, i):
+        """Decodes frame number i by seeking directly to its offset from the frame index."""
+        index = self.load_index()
+        return self._read_frames(index["offset"][[i]])[0]
+
+    def frames_between(self, t0, t1):
+        """Decodes all frames with t0 <= time_offset <= t1 (raw milliseconds, as in the records)."""
+        return self._read_frames(self._index_window(self.load_index(), t0, t1))
+
+    def _index_window(self, index, t0, t1):
+        """Offsets of the frames with t0 <= time_offset <= t1 in a frame index."""
+        time_offsets = index["time_offset"]
+        if np.all(time_offsets[1:] >= time_offsets[:-1]):
+            start = np.searchsorted(time_offsets, t0, side='left')
+            stop = np.searchsorted(time_offsets, t1, side='right')
+            return index["offset"][start:stop]
+        return index["offset"][(time_offsets >= t0) & (time_offsets <= t1)]
+
+    def extract(self, start, end, output_path=None):
+        """Decodes only the frames recorded between the wall clock times start and end (inclusive).
+
+        start/end are datetimes (naive ones count as UTC), ISO strings or Unix seconds, None for an open end. The wall
+        clock time of a frame
+        is time1 of the first frame plus its time_offset since the first frame. The window is found by binary search over
+        time_offset: in the frame index if it is loaded or its sidecar is up to date, otherwise by probing frame
+        headers in the file (time_offset has to increase through the file). The frames end up in self.records like
+        with decode() and are returned, with output_path they are also saved as CSV.
+        """
+        self.instrumentation.start_run(self.filepath)
+        with open(self.filepath, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_file_header(mm)
+            time1 = struct.unpack_from('<I', mm, FILE_HEADER_SIZE + 60)[0]
+            first_offset = struct.unpack_from('<i', mm, FILE_HEADER_SIZE + 140)[0]
+            origin = time1 - GPS_EPOCH_OFFSET - first_offset / 1000  # Unix time at time_offset 0
+            # rounded to microseconds first, Unix seconds as float are not exact in the last digits
+            t0 = float('-inf') if start is None else ceil(round((self._unix_time(start) - origin) * 1000, 3))
+            t1 = float('inf') if end is None else floor(round((self._unix_time(end) - origin) * 1000, 3))
+
+            index = self.index if self.index is not None else self._read_index(os.stat(self.filepath))
+            if index is not None:
+                self.index = index
+                offsets = self._index_window(index, t0, t1)
+            else:
+                first = self._bisect_time(mm, t0)
+                stop = self._bisect_time(mm, t1, after=True)
+                offsets = [] if first is None else self._scan_frame_offsets(mm, first, end=len(mm) if stop is None else stop)
+
+            records = []
+            for pos in offsets:
+                pos = int(pos)
+                rejected_by = self._reject_frame(mm, pos) if self.filter_plan else None
+                if rejected_by is None:
+                    records.append(self._decode_record(mm, pos, 0))
+                else:
+                    self.rejected_frames[rejected_by] += 1
+        finally:
+            mm.close()
+        self.records = records
+        self.instrumentation.add_frames(len(offsets), 0)
+        self.instrumentation.end_run()
+        self._report_rejected_frames()
+        if self.verbose:
+            print(f"Extracted {len(records)} frames.")
+        if output_path is not None:
+            self.save_to_csv(output_path, records)
+        return records
+
+    def _unix_time(self, value):
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                value = datetime.fromisoformat(value)
+        if isinstance(value, datetime):
+            return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+        return float(value)
+
+    def _bisect_time(self, data, target, after=False):
+        """Offset of the first frame with time_offset >= target (> target with after=True), None if there is none.
+
+        Bisection over the byte positions of the file: a probe reads the next plausible frame header at or after the
+        position (find_next_frame), so only about log2(file size) headers are read instead of walking all frames.
+        """
+        low, high = FILE_HEADER_SIZE, len(data)
+        found = None  # first frame at or after `high`
+        while low < high:
+            middle = (low + high) // 2
+            pos = self.find_next_frame(data, middle, chunk_size=PROBE_CHUNK_SIZE)
+            if pos is None or pos >= high:  # same frame as for `high`
+                high = middle
+                continue
+            time_offset = struct.unpack_from('<i', data, pos + 140)[0]
+            if time_offset > target or (time_offset == target and not after):
+                high, found = middle, pos
+            else:
+                low = pos + 1
+        return found
+
+    def _read_frames(self, offsets):
+        """Reads and decodes the frames at the given byte offsets."""
+        records = []
+        with open(self.filepath, 'rb') as f:
+            for pos in offsets:
+                f.seek(int(pos))
+                header = f.read(FRAME_HEADER_SIZE)
+                block_size = struct.unpack('<h', header[28:30])[0]
+                data = header + f.read(max(0, 145 + block_size - FRAME_HEADER_SIZE))
+                records.append(self._decode_record(data, 0, block_size))
+        return records
+
+    def _scan_frame_offsets(self, data, pos, limit=None, end=None):
+        """Walks the frames by their packet size (+34) and returns the byte offset of every complete frame header.
+
+        With `limit` the walk stops after that many frames, with `end` at the first frame starting at or after it.
+        """
+        offsets = []
+        size = len(data)
+        end = size if end is None else end
+        while pos < end and pos + FRAME_HEADER_SIZE <= size:
+            if limit is not None and len(offsets) == limit:
+                return np.array(offsets, dtype=np.int64)
+            offsets.append(pos)
+            pos += PACKET_SIZE_STRUCT.unpack_from(data, pos + 34)[0] + FRAME_HEADER_SIZE
+        if pos < min(end, size):
+            print(f"Error decoding record: incomplete frame header at byte {pos}")
+        return np.array(offsets, dtype=np.int64)
+
+    def _gather_frame_headers(self, data, offsets):
+        """Copies the 144 byte headers at the given offsets into one structured FRAME_HEADER_DTYPE array."""
+        raw = np.frombuffer(data, dtype=np.uint8)
+        if len(offsets) == 0:
+            return np.zeros(0, dtype=frame_header_dtype())
+        windows = np.lib.stride_tricks.sliding_window_view(raw, FRAME_HEADER_SIZE)
+        return windows[offsets].view(frame_header_dtype()).reshape(-1)
     
-    def _decode_record(self, data, pos, block_size):
-        """Dekodiert einen einzelnen Datenblock."""
+    def _decode_record(self, data, pos, block_size, sounding_view=False):
+        """Dekodiert einen einzelnen Datenblock.
+
+        With sounding_view=True the sounding data is returned as a slice of `data` (e.g. a memoryview) instead of a list.
+        """
+        if self.field_plan is not None:
+            return self._decode_projected_record(data, pos, sounding_view)
+
+        timing = self.instrumentation.enabled
+        if timing:
+            started = time.perf_counter()
+
         # Read raw values
         '''frame_offset = struct.unpack('<I', data[pos + 0:pos + 4])[0]
         prim_last_channel_frame_offset = struct.unpack('<I', data[pos + 4:pos + 8])[0]
@@ -168,17 +1397,19 @@ class SL2Decoder:
         time_offset_raw = struct.unpack('<i', data[pos + 140:pos + 144])[0]
 
         
-        # Conversion of raw values. Used if the config file specifies a different unit than the raw value.
-        upper_limit = self._convert_distance(upper_limit_raw)
-        lower_limit = self._convert_distance(lower_limit_raw)
-        water_depth = self._convert_distance(water_depth_raw)
-        speed_gps = self._convert_speed(speed_gps_raw)
-        latitude, longitude = self._convert_coordinates(lat_raw, lng_raw)
-        speed_water = self._convert_speed(speed_water_raw)
-        time_offset = self._convert_time(time_offset_raw)
+        if timing:
+            parsed = time.perf_counter()
+            self.instrumentation.add_time("header_parse", parsed - started)
 
+        # Records keep the raw values, units and coordinates are converted for whole columns in convert_columns
 
-        sounding_data = self._extract_sounding_data(data[pos + 145:pos + 145 + block_size])
+        sounding_block = data[pos + 145:pos + 145 + block_size]
+        if self.config["sounding_bins"] is not None:
+            sounding_block = self._reduce_sounding(sounding_block)
+        sounding_data = sounding_block if sounding_view else self._extract_sounding_data(sounding_block)
+
+        if timing:
+            self.instrumentation.add_time("sounding_extraction", time.perf_counter() - parsed)
 
 
         # Select data fields to include in the output
@@ -195,8 +1426,8 @@ class SL2Decoder:
             "channel": channel,
             "packet_size": packet_size,
             "frame_index": frame_index,
-            "upper_limit": upper_limit if self.config.get("units", {}).get("distance") == "meter" else upper_limit_raw,
-            "lower_limit": lower_limit if self.config.get("units", {}).get("distance") == "meter" else lower_limit_raw,
+            "upper_limit": upper_limit_raw,
+            "lower_limit": lower_limit_raw,
             "unknownPart1_1": unknownPart1_1,
             "unknownPart1_2": unknownPart1_2,
             "unknownPart1_3": unknownPart1_3,
@@ -210,7 +1441,7 @@ class SL2Decoder:
             "unknownPart2_5": unknownPart2_5,
             "unknownPart2_6": unknownPart2_6,
             "time1": time1_raw,
-            "water_depth": water_depth if self.config.get("units", {}).get("distance") == "meter" else water_depth_raw,
+            "water_depth": water_depth_raw,
             "keel_depth": keel_depth_raw,
             "unknownPart3_1": unknownPart3_1,
             "unknownPart3_2": unknownPart3_2,
@@ -264,7 +1495,52 @@ class SL2Decoder:
             #here you can add more fields if needed or comment out fields wich are not needed, see the documentation for the full list of possible fields
     }    
 
-    def clean_csv(self, input_path, output_path):
+    def _is_clean_record(self, record):
+        """Same validity check as clean_csv, for decoded records."""
+        return all(record[name] == value for name, value in CLEAN_CHECK_FIELDS.items())
+
+    def _decode_projected_record(self, data, pos, sounding_view=False):
+        """Dekodiert nur die in der Konfiguration unter `fields` ausgewählten Felder eines Datenblocks."""
+        if pos + FRAME_HEADER_SIZE > len(data):
+            raise struct.error(f"unpack requires a buffer of {FRAME_HEADER_SIZE} bytes")
+
+        timing = self.instrumentation.enabled
+        if timing:
+            started = time.perf_counter()
+
+        record = {}
+        for name, offset, unpacker, derived in self.field_plan:
+            value = unpacker.unpack_from(data, pos + offset)[0]
+            record[name] = _derived_value(name, value) if derived else value
+
+        if timing:
+            parsed = time.perf_counter()
+            self.instrumentation.add_time("header_parse", parsed - started)
+
+        if self.decode_soundings:
+            block_size = struct.unpack_from('<h', data, pos + 28)[0]
+            sounding_block = data[pos + 145:pos + 145 + block_size]
+            if self.config["sounding_bins"] is not None:
+                sounding_block = self._reduce_sounding(sounding_block)
+            record["sounding_data"] = sounding_block if sounding_view else self._extract_sounding_data(sounding_block)
+            if timing:
+                self.instrumentation.add_time("sounding_extraction", time.perf_counter() - parsed)
+        return record
+
+    def clean_csv(self, input_path=None, output_path=None, records=None):
+        """Keeps only the valid rows of the raw CSV.
+
+        If `records` is given (e.g. iter_records()), they are filtered and written directly and input_path is not needed:
+        clean_csv(output_path='clean.csv', records=decoder.iter_records()).
+        """
+        if output_path is None:
+            raise ValueError("clean_csv needs output_path")
+        if records is None and input_path is None:
+            raise ValueError("clean_csv needs input_path or records")
+        if records is not None:
+            self.save_to_csv(output_path, (record for record in records if self._is_clean_record(record)))
+            return
+
         valid_rows = []
         
         with open(input_path, 'r', newline='') as infile:
@@ -291,125 +1567,288 @@ class SL2Decoder:
             writer.writeheader()
             writer.writerows(valid_rows)
 
-    def _convert_speed(self, value):
-        """Conversion of speed values (from knots to km/h)."""
-        value_km_h = value * self.config["speed_conversion"]
-        return f"{value_km_h:.2f}" # rounded to 2 decimal places
-    
-    def _convert_distance(self, value):
-        """Conversion of distance values (from feet to meters)."""
-        value_meters = value * self.config["distance_conversion"]
-        return f"{value_meters:.3f}" # rounded to 3 decimal places
-    
-    def _convert_time(self, value):
-        """Conversion of time values (from milliseconds to minutes)."""
-        return f"{value / 1000:.4f}" # seconds since system start up to hundreth (ms)
-
-    def _convert_coordinates(self, lng_raw, lat_raw):
-        """Converts Spherical Mercator coordinates to WGS84 (Lat,Lng)."""
-        if not self.config["convert_coordinates"]:
-            return lng_raw, lat_raw
-
-        longitude = lng_raw / self.POLAR_EARTH_RADIUS * (180 / pi)
-        temp = lat_raw / self.POLAR_EARTH_RADIUS
-        temp = exp(temp)
-        latitude = (2 * atan(temp) - (pi / 2)) * (180 / pi)
-        return f"{longitude:.8f}", f"{latitude:.8f}"       
-        
+    def convert_columns(self, columns):
+        """Converts whole columns at once, the results stay numeric (float64) and are only formatted when written.
+
+        Distances feet -> m and speeds knots -> km/h as configured under `units`, time_offset ms -> s, and with
+        `coordinates: wgs84` the Spherical Mercator latitude/longitude to WGS84 degrees (both hemispheres).
+        """
+        converted = dict(columns)
+        if self.config["distance_conversion"] != 1.0:
+            for name in ("upper_limit", "lower_limit", "water_depth"):
+                if name in columns:
+                    converted[name] = columns[name] * self.config["distance_conversion"]
+        if self.config["speed_conversion"] != 1.0:
+            for name in ("speed_gps", "speed_water"):
+                if name in columns:
+                    converted[name] = columns[name] * self.config["speed_conversion"]
+        if "time_offset" in columns:
+            converted["time_offset"] = columns["time_offset"] / 1000
+        if self.config["convert_coordinates"]:
+            if "longitude" in columns:
+                converted["longitude"] = np.degrees(columns["longitude"] / self.POLAR_EARTH_RADIUS)
+            if "latitude" in columns:
+                # inverse Mercator, 2 * atan(exp(y)) - pi/2 == atan(sinh(y)) for both signs of y
+                converted["latitude"] = np.degrees(np.arctan(np.sinh(columns["latitude"] / self.POLAR_EARTH_RADIUS)))
+        return converted
+
     def _decode_channel(self, channel):
-        channels = {
-            0: "Primary",
-            1: "Secondary",
-            2: "DSI (Downscan)",
-            3: "Left (Sidescan)",
-            4: "Right (Sidescan)",
-            5: "Composite"
-        }
-        return channels.get(channel, "Other/invalid")
+        return _derived_value("channel_name", channel)
 
     def _decode_frequency(self, frequency):
-        frequencies = {
-            0: "200 KHz",
-            1: "50 KHz",
-            2: "83 KHz",
-            4: "800 KHz",
-            5: "38 KHz",
-            6: "28 KHz",
-            7: "130-210 KHz",
-            8: "90-150 KHz",
-            9: "40-60 KHz",
-            10: "25-45 KHz"
-        }
-        return frequencies.get(frequency, "Other/invalid")
-
-    def _decode_flags(self, flag_bytes):
-        bits = bitarray(endian='little')
-        bits.frombytes(flag_bytes)
-        flags = {
-            "TrackValid": bits[0],
-            "WaterSpeedValid": bits[1],
-            "PositionValid": bits[3],
-            "WaterTempValid": bits[5],
-            "GpsSpeedValid": bits[6],
-            "AltitudeValid": bits[14],
-            "HeadingValid": bits[15]
-        }
-        return flags
+        return _derived_value("frequency_name", frequency)
+
+    def _decode_flags(self, flags):
+        """Flag bits of the raw flags value (or its two bytes), for whole columns see _derived_column."""
+        if isinstance(flags, (bytes, bytearray, memoryview)):
+            flags = int.from_bytes(flags, 'little')
+        return {name: _derived_value(name, flags) for name in FLAG_BITS}
 
 
     def _extract_sounding_data(self, data_block):
-    # Convert raw sounding data block into a list of values
-        return list(data_block)
+    # Convert raw sounding data block (or the reduced array) into a list of values
+        return data_block.tolist() if hasattr(data_block, "tolist") else list(data_block)
+
+    def save_to_csv(self, output_path, records=None, append=False, clean_path=None):
+        """Speichert die dekodierten Daten als CSV mit festen Sounding-Spalten.
 
-    def save_to_csv(self, output_path):
-        """Speichert die dekodierten Daten als CSV mit festen Sounding-Spalten."""
-        if not self.records:
+        `records` can be any iterable of decoded records, e.g. iter_records() to write the file in constant memory.
+        Defaults to self.records. With append=True the rows are appended and the header is only written to an empty file.
+        With clean_path the rows passing the check of clean_csv are written there as well, in the same pass.
+        """
+        records = iter(self.records if records is None else records)
+        first_record = next(records, None)
+        if first_record is None:
             print("Keine Daten zum Speichern vorhanden!")
             return
 
         # Basis-Header definieren (alle Spalten ohne Sounding-Daten)
-        base_headers = list(self.records[0].keys())
+        base_headers = list(first_record.keys())
+        missing = [name for name in CLEAN_CHECK_FIELDS if name not in first_record]
+        if clean_path is not None and missing:
+            raise ValueError(f"The cleaned CSV needs the fields {missing}, add them to `fields` in the config")
 
         # Prüfen, ob `sounding_data` existiert, dann feste Spaltennamen für jedes sounding_data byte erzeugen
-        if "sounding_data" in base_headers:
-            packet_size = 1920  # Anzahl der Sounding-Werte pro Block (fest definiert)
-            sounding_headers = [f"sounding_{i+1}" for i in range(packet_size)]
+        has_soundings = "sounding_data" in base_headers
+        if has_soundings:
+            sounding_headers = [f"sounding_{i+1}" for i in range(self.sounding_columns)]
             base_headers.remove("sounding_data")  # `sounding_data`-Key aus der Basis-Headerliste entfernen
             headers = base_headers + sounding_headers  # Sounding-Spalten anhängen
         else:
             headers = base_headers  # Falls keine Sounding-Daten existieren, bleibt der Header normal
 
-        # CSV speichern
-        with open(output_path, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
+        # CSV speichern, die Zeilen werden positionsweise in der Reihenfolge der Header geschrieben
+        timing = self.instrumentation.enabled
+        with ExitStack() as stack:
+            f = stack.enter_context(open(output_path, 'a' if append else 'w', newline='', buffering=CSV_WRITE_BUFFER))
+            clean = None if clean_path is None else stack.enter_context(open(clean_path, 'w', newline='', buffering=CSV_WRITE_BUFFER))
+            if not (append and f.tell() > 0):
+                csv.writer(f).writerow(headers)
+            if clean is not None:
+                csv.writer(clean).writerow(headers)
+            rows = chain([first_record], records)
 
-            for record in self.records:
-                row = record.copy()
-                if "sounding_data" in record:
-                    sounding_values = record["sounding_data"]
+            # Scalar columns go through the csv module (quoting), the sounding bytes are joined from SOUNDING_TEXT.
+            # The trailing None yields the separator in front of the first sounding column.
+            line = io.StringIO()
+            line_writer = csv.writer(line, lineterminator='')
+            for record in rows:
+                if timing:
+                    started = time.perf_counter()
+                line.seek(0)
+                line.truncate()
+                if has_soundings:
+                    line_writer.writerow([record[name] for name in base_headers] + [None])
+                    text = (line.getvalue() if base_headers else '') + self._sounding_csv_text(record["sounding_data"]) + '\r\n'
+                else:
+                    line_writer.writerow([record[name] for name in base_headers])
+                    text = line.getvalue() + '\r\n'
+                f.write(text)
+                if clean is not None and self._is_clean_record(record):
+                    clean.write(text)
+                if timing:
+                    self.instrumentation.add_time("serialization", time.perf_counter() - started)
 
-                    # Falls weniger als 1920 Werte: Mit None auffüllen
-                    if len(sounding_values) < packet_size:
-                        sounding_values.extend([None] * (packet_size - len(sounding_values)))
+    def to_arrays(self, convert=False):
+        """Returns the decoded frames as typed columns and the sounding data as 2-D uint8 matrix (frames x samples).
 
-                    # Sounding-Werte in die festgelegten Spalten eintragen
-                    for i in range(packet_size):
-                        row[f"sounding_{i+1}"] = sounding_values[i]
+        Uses the columns of decode_columns() if present, otherwise self.records. Without `fields` in the config the
+        derived columns (flag booleans, channel_name, frequency_name) are added. Shorter sounding payloads are padded
+        with 0, their real length is in the column `sounding_length`. The matrix is None without sounding data and has
+        `soundings: bins` columns if set in the config.
+        With convert=True the columns are passed through convert_columns.
+        """
+        if isinstance(self.records, FrameRecordView):
+            view = self.records
+            with self._timed("conversion"):
+                columns = self.convert_columns(self.columns) if convert else dict(self.columns)
+            if not view.soundings:
+                return columns, None
+            with self._timed("sounding_extraction"):
+                soundings, columns["sounding_length"] = self._gather_soundings(np.frombuffer(view.data, dtype=np.uint8), view.frame_offsets, view.block_sizes)
+            return columns, soundings
 
-                    # `sounding_data`-Key entfernen, da es nun in Spalten aufgeteilt wurde
-                    del row["sounding_data"]
+        names = [name for name in (self.records[0].keys() if self.records else self.header_fields) if name != "sounding_data"]
+        header_dtypes = frame_header_dtype().fields
+        columns = {
+            name: np.array([record[name] for record in self.records],
+                           dtype=header_dtypes[name][0] if name in header_dtypes else None)
+            for name in names
+        }
+        if self.field_plan is None and self.records:
+            columns.update((name, _derived_column(name, columns)) for name in DERIVED_FIELDS)
+        if convert:
+            with self._timed("conversion"):
+                columns = self.convert_columns(columns)
+        if not self.decode_soundings:
+            return columns, None
+        payloads = [record["sounding_data"] for record in self.records]
 
-                writer.writerow(row)
+        with self._timed("sounding_extraction"):
+            lengths = np.array([len(payload) for payload in payloads], dtype=np.int32)
+            soundings = np.zeros((len(payloads), int(lengths.max(initial=0))), dtype=np.uint8)
+            for row, payload in zip(soundings, payloads):
+                row[:len(payload)] = np.frombuffer(bytes(payload), dtype=np.uint8)
+        columns["sounding_length"] = lengths
+        return columns, soundings
+
+    @contextmanager
+    def _timed(self, phase):
+        """Reports the time of a whole block as phase, for coarse steps like a complete export."""
+        if not self.instrumentation.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.instrumentation.add_time(phase, time.perf_counter() - started)
+
+    def save_to_npz(self, output_path, convert=False):
+        """Speichert die Spalten und die Sounding-Matrix (`soundings`) als NumPy .npz-Archiv."""
+        columns, soundings = self.to_arrays(convert)
+        if soundings is not None:
+            columns["soundings"] = soundings
+        with self._timed("serialization"):
+            np.savez(output_path, **columns)
+
+    def save_to_npy(self, output_dir, convert=False):
+        """Speichert jede Spalte und die Sounding-Matrix als eigene .npy-Datei, z.B. für np.load(..., mmap_mode='r')."""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        columns, soundings = self.to_arrays(convert)
+        if soundings is not None:
+            columns["soundings"] = soundings
+        with self._timed("serialization"):
+            for name, values in columns.items():
+                np.save(output_dir / f"{name}.npy", values)
+
+    def to_arrow_table(self, convert=False):
+        """Returns the decoded frames as pyarrow.Table, soundings as fixed size list<uint8> column `soundings`."""
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("pyarrow is required for the Arrow/Parquet export (pip install pyarrow)") from e
+
+        columns, soundings = self.to_arrays(convert)
+        arrays = {name: pa.array(values) for name, values in columns.items()}
+        for name in CATEGORY_NAMES:
+            if name in arrays:
+                arrays[name] = arrays[name].dictionary_encode()
+        if soundings is not None:
+            arrays["soundings"] = pa.FixedSizeListArray.from_arrays(pa.array(soundings.reshape(-1)), soundings.shape[1])
+        return pa.table(arrays)
+
+    def save_to_parquet(self, output_path, convert=False):
+        """Speichert die dekodierten Daten als Parquet-Datei (benötigt pyarrow)."""
+        import pyarrow.parquet as pq
+        table = self.to_arrow_table(convert)
+        with self._timed("serialization"):
+            pq.write_table(table, output_path)
+
+    def save_to_arrow(self, output_path, convert=False):
+        """Speichert die dekodierten Daten als unkomprimierte Arrow-IPC-Datei, die per Memory-Map geladen werden kann."""
+        import pyarrow.feather as feather
+        table = self.to_arrow_table(convert)
+        with self._timed("serialization"):
+            feather.write_feather(table, output_path, compression='uncompressed')
+
+    def save_to_archive(self, output_path, chunk_frames=1024, codec=None, level=None):
+        """Speichert die Frames als komprimiertes Archiv mit Chunk-Index, lesbar per SonarArchive (Frame oder Zeitfenster)."""
+        from .sonarArchive import write_archive
+        with self._timed("serialization"):
+            return write_archive(self, output_path, chunk_frames, codec, level)
+
+    def _sounding_csv_text(self, sounding_data):
+        """CSV text of the sounding columns, cut or padded with empty values to CSV_SOUNDING_COLUMNS (or `soundings: bins`)."""
+        values = sounding_data[:self.sounding_columns]
+        missing = self.sounding_columns - len(values)
+        if not len(values):
+            return ',' * (self.sounding_columns - 1)
+        return ','.join(map(SOUNDING_TEXT.__getitem__, values)) + ',' * missing
 
 # Example usage
 # decoder = SL2Decoder('path_to_file.sl2')
-# decoder.decode()
+# decoder.decode()  # or decoder.decode_parallel() on all cores
 # decoder.save_to_csv('output.csv')
+# with performance data (frames/s, time per phase, peak memory) as JSON report:
+# instrumentation = PerfInstrumentation()
+# decoder = SL2Decoder('path_to_file.sl2', 'lowFakeConfig.yaml', instrumentation=instrumentation)
+# ...
+# instrumentation.write_report('decoder_perf.json')
+# or skipping damaged frames instead of stopping at the first one:
+# decoder.decode(recover=True); print(decoder.skipped_ranges)
+# or streaming in constant memory:
+# decoder.save_to_csv('output.csv', decoder.iter_records())
+# or following a recording that is still growing:
+# decoder.follow('output.csv', idle_timeout=60)
+# or as typed columns with the soundings as uint8 matrix:
+# decoder.save_to_npz('output.npz') / decoder.save_to_parquet('output.parquet')
+# or split by channel, e.g. only the sidescan:
+# left_columns, left_soundings = decoder.demux_channels(["left", "right"])[3]
+# or in batches of typed columns in constant memory, e.g. as echogram tiles (EchogramRenderer in echogramTiles.py):
+# for columns, soundings in decoder.iter_batches(4096, ["downscan"]): ...
+# or only a time window, found by binary search over time_offset:
+# decoder.extract('2025-06-01T12:00:00', '2025-06-01T12:05:00', 'excerpt.csv')
+# or compressed with random access by frame or time window (zstd/lz4 if installed, otherwise zlib):
+# decoder.save_to_archive('output.sl2a'); record, sounding = SonarArchive('output.sl2a').get_frame(1000)
+# from the command line: lowfake-decode file.sl2 -o output.csv (installed), python -m lowfake.sl2ToCsv.lowranceToHumanReadable
+# or python src/sl2ToCsv/lowranceToHumanReadable.py, which runs the installed package (pip install -e .)
 # from https://wiki.openstreetmap.org/wiki/SL2 and https://gitlab.com/hrbrmstr/arabia
 
 
-decoder = SL2Decoder(filepath, config_path, verbose=True)
-decoder.decode()
-decoder.save_to_csv(csv_path)
-decoder.clean_csv(csv_path,csv_path_cleaned)
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decodes a Lowrance SL2/SLG/SL3 file into a CSV.")
+    parser.add_argument("input", nargs="?", default=None, help="sonar file (default: the example recording in decoderDocs)")
+    parser.add_argument("-c", "--config", default=None, help="lowFakeConfig.yaml (default: raw values, all fields)")
+    parser.add_argument("-o", "--output", default=None, help="raw CSV (default: <input>.csv)")
+    parser.add_argument("--clean", default=None, help="also write the cleaned CSV to this path")
+    parser.add_argument("--recover", action="store_true", help="skip damaged frames instead of stopping")
+    parser.add_argument("--start", default=None, help="only frames from this time on (ISO, naive = UTC, or Unix seconds)")
+    parser.add_argument("--end", default=None, help="only frames up to this time (ISO, naive = UTC, or Unix seconds)")
+    parser.add_argument("--perf", action="store_true", help="measure the decoding and write <output>.perf.json")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    example = args.input is None
+    if example and not filepath.exists():
+        parser.error(f"no input given and the example recording {filepath} is not available")
+    input_path = filepath if example else Path(args.input)
+    output_path = Path(args.output) if args.output else csv_path if example else input_path.with_suffix(".csv")
+    clean_path = Path(args.clean) if args.clean else csv_path_cleaned if example else None
+
+    instrumentation = PerfInstrumentation() if args.perf else None
+    decoder = SL2Decoder(input_path, args.config, verbose=not args.quiet, instrumentation=instrumentation)
+    if args.start is not None or args.end is not None:
+        records = decoder.extract(args.start, args.end, output_path)
+        if clean_path is not None:
+            decoder.clean_csv(output_path=clean_path, records=records)
+    else:
+        decoder.save_to_csv(output_path, decoder.iter_records(args.recover), clean_path=clean_path)
+    if args.perf:
+        instrumentation.write_report(output_path.with_suffix(".perf.json"))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
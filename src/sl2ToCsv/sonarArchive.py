@@ -0,0 +1,281 @@
+import json
+import struct
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from ..lazyImport import LazyModule
+from .lowranceToHumanReadable import DERIVED_FIELDS, FrameRecordView, _derived_column
+
+np = LazyModule("numpy", globals(), "np")
+
+# Layout: ARCHIVE_HEADER_STRUCT + JSON metadata, the chunks, the chunk index (ARCHIVE_CHUNK_FIELDS records) and
+# ARCHIVE_FOOTER_STRUCT with the offset of the chunk index. Every chunk holds chunk_frames frames as two compressed
+# blocks: all header columns (integer columns delta encoded) and the sounding matrix (delta along the samples where
+# that compresses better, noisy recordings often do not).
+ARCHIVE_MAGIC = b"SL2A"
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER_STRUCT = struct.Struct('<4sHI')  # magic, version, length of the JSON metadata
+ARCHIVE_FOOTER_STRUCT = struct.Struct('<Q4s')  # offset of the chunk index, magic
+ARCHIVE_CHUNK_FIELDS = [
+    ("offset", "<u8"),
+    ("columns_size", "<u4"),
+    ("soundings_size", "<u4"),
+    ("first_frame", "<u8"),
+    ("frames", "<u4"),
+    ("width", "<u4"),  # columns of the sounding matrix of this chunk
+    ("sounding_delta", "u1"),  # 1 if the soundings are stored as differences along the samples
+    ("time_min", "<i8"),  # range of time_offset in this chunk, for time windows
+    ("time_max", "<i8"),
+]
+DEFAULT_CHUNK_FRAMES = 1024
+CODECS = ("zstd", "lz4", "zlib")
+DELTA_PROBE_ROWS = 64  # rows of a chunk compressed both ways to choose the sounding encoding
+
+
+def _codec(name, level=None):
+    """(compress, decompress) of a codec, zstd and lz4 need the zstandard/lz4 packages."""
+    if name in ("zstd", "lz4"):
+        try:
+            __import__("zstandard" if name == "zstd" else "lz4.frame")
+        except ImportError as e:
+            raise ImportError(f"codec {name} needs the {'zstandard' if name == 'zstd' else 'lz4'} package (pip install lowfake[archive]), zlib works without") from e
+    if name == "zstd":
+        import zstandard
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return compressor.compress, zstandard.ZstdDecompressor().decompress
+    if name == "lz4":
+        import lz4.frame
+        return (lambda data: lz4.frame.compress(data, compression_level=level or 0)), lz4.frame.decompress
+    if name == "zlib":
+        return (lambda data: zlib.compress(data, 6 if level is None else level)), zlib.decompress
+    raise ValueError(f"Unknown codec: {name} (available: {', '.join(CODECS)})")
+
+
+def default_codec():
+    """zstd if installed, otherwise lz4, otherwise the stdlib zlib."""
+    for name, module in (("zstd", "zstandard"), ("lz4", "lz4.frame")):
+        try:
+            __import__(module)
+            return name
+        except ImportError:
+            pass
+    return "zlib"
+
+
+def _is_delta_column(values):
+    return values.dtype.kind in "iu" and values.dtype.itemsize > 1
+
+
+def _encode_columns(columns):
+    """Concatenated bytes of all columns, integer columns as differences to the previous frame (first value kept)."""
+    parts = []
+    for values in columns.values():
+        if _is_delta_column(values):
+            values = np.diff(values, prepend=values.dtype.type(0))  # wraps around like the decoding cumsum
+        parts.append(np.ascontiguousarray(values).tobytes())
+    return b"".join(parts)
+
+
+def _decode_columns(data, layout, frames):
+    columns = {}
+    pos = 0
+    for name, dtype in layout:
+        dtype = np.dtype(dtype)
+        values = np.frombuffer(data, dtype=dtype, count=frames, offset=pos)
+        pos += dtype.itemsize * frames
+        columns[name] = np.cumsum(values, dtype=dtype) if _is_delta_column(values) else values.copy()
+    return columns
+
+
+def _sounding_deltas(matrix):
+    return np.diff(matrix, axis=1, prepend=np.uint8(0))  # uint8, wraps around like the decoding cumsum
+
+
+def write_archive(decoder, output_path, chunk_frames=DEFAULT_CHUNK_FRAMES, codec=None, level=None):
+    """Writes the frames of the decoder as archive, chunk by chunk. Returns the number of frames.
+
+    Uses the columns of decode_columns() (run first if necessary), or to_arrays() after decode(). Derived columns are
+    not stored if their source column is, SonarArchive computes them again from flags, channel and frequency.
+    codec is 'zstd', 'lz4' or 'zlib' (default: default_codec()), level the compression level of the codec.
+    """
+    codec = codec or default_codec()
+    compress, _ = _codec(codec, level)
+    if not isinstance(decoder.records, FrameRecordView) and not decoder.records:
+        decoder.decode_columns()
+
+    if isinstance(decoder.records, FrameRecordView):
+        view = decoder.records
+        names = list(decoder.columns)
+        columns = dict(decoder.columns)
+        raw = np.frombuffer(view.data, dtype=np.uint8)
+        soundings = None
+
+        def chunk_soundings(start, stop):
+            return decoder._gather_soundings(raw, view.frame_offsets[start:stop], view.block_sizes[start:stop])
+        has_soundings = view.soundings
+    else:
+        columns, soundings = decoder.to_arrays()
+        names = list(columns)
+        lengths = columns.pop("sounding_length", None)
+
+        def chunk_soundings(start, stop):
+            return soundings[start:stop], lengths[start:stop]
+        has_soundings = soundings is not None
+
+    columns = {name: values for name, values in columns.items() if DERIVED_FIELDS.get(name) not in columns}
+    frames = len(next(iter(columns.values()))) if columns else len(decoder.records)
+    stored = dict(columns)
+    if has_soundings:
+        stored["sounding_length"] = np.zeros(0, dtype=np.int32)
+        if "sounding_length" not in names:
+            names.append("sounding_length")
+    metadata = {
+        "source": str(decoder.filepath),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "codec": codec,
+        "frames": frames,
+        "chunk_frames": chunk_frames,
+        "names": names,  # output order, including the derived columns
+        "columns": [[name, values.dtype.str] for name, values in stored.items()],
+        "soundings": has_soundings,
+    }
+    metadata_bytes = json.dumps(metadata).encode()
+
+    chunks = np.zeros(-(-frames // chunk_frames), dtype=ARCHIVE_CHUNK_FIELDS)
+    with open(output_path, 'wb') as f:
+        f.write(ARCHIVE_HEADER_STRUCT.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, len(metadata_bytes)))
+        f.write(metadata_bytes)
+        for chunk, start in zip(chunks, range(0, frames, chunk_frames)):
+            stop = min(start + chunk_frames, frames)
+            chunk_columns = {name: values[start:stop] for name, values in columns.items()}
+            sounding_block = b""
+            width = 0
+            if has_soundings:
+                matrix, chunk_lengths = chunk_soundings(start, stop)
+                chunk_columns["sounding_length"] = np.asarray(chunk_lengths, dtype=np.int32)
+                width = matrix.shape[1]
+                probe = matrix[:DELTA_PROBE_ROWS]
+                chunk["sounding_delta"] = len(compress(_sounding_deltas(probe).tobytes())) < len(compress(probe.tobytes()))
+                sounding_block = compress((_sounding_deltas(matrix) if chunk["sounding_delta"] else matrix).tobytes())
+            column_block = compress(_encode_columns(chunk_columns))
+            time_offsets = chunk_columns.get("time_offset")
+            chunk["offset"] = f.tell()
+            chunk["columns_size"] = len(column_block)
+            chunk["soundings_size"] = len(sounding_block)
+            chunk["first_frame"] = start
+            chunk["frames"] = stop - start
+            chunk["width"] = width
+            chunk["time_min"] = time_offsets.min() if time_offsets is not None else 0
+            chunk["time_max"] = time_offsets.max() if time_offsets is not None else 0
+            f.write(column_block)
+            f.write(sounding_block)
+        index_offset = f.tell()
+        f.write(chunks.tobytes())
+        f.write(ARCHIVE_FOOTER_STRUCT.pack(index_offset, ARCHIVE_MAGIC))
+
+    if decoder.verbose:
+        print(f"Archive saved: {output_path} ({frames} frames in {len(chunks)} chunks, {codec})")
+    return frames
+
+
+class SonarArchive:
+    """Reads an archive of write_archive(): single frames, frame ranges or time windows, decompressing only the chunks
+    that contain them.
+
+    archive = SonarArchive('survey.sl2a')
+    record, sounding = archive.get_frame(1000)
+    columns, soundings = archive.time_window(60000, 120000)
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            magic, version, metadata_size = ARCHIVE_HEADER_STRUCT.unpack(f.read(ARCHIVE_HEADER_STRUCT.size))
+            if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+                raise ValueError(f"{self.path} is not a sonar archive of version {ARCHIVE_VERSION}")
+            self.metadata = json.loads(f.read(metadata_size))
+            f.seek(-ARCHIVE_FOOTER_STRUCT.size, 2)
+            index_offset, magic = ARCHIVE_FOOTER_STRUCT.unpack(f.read(ARCHIVE_FOOTER_STRUCT.size))
+            if magic != ARCHIVE_MAGIC:
+                raise ValueError(f"{self.path} is incomplete, the chunk index is missing")
+            f.seek(index_offset)
+            chunk_dtype = np.dtype(ARCHIVE_CHUNK_FIELDS)
+            self.chunks = np.frombuffer(f.read(chunk_dtype.itemsize * -(-self.metadata["frames"] // self.metadata["chunk_frames"])), dtype=chunk_dtype)
+        self.layout = [(name, dtype) for name, dtype in self.metadata["columns"]]
+        self._decompress = _codec(self.metadata["codec"])[1]
+        self._cached = (None, None)  # last decompressed chunk, for sequential get_frame calls
+
+    def __len__(self):
+        return self.metadata["frames"]
+
+    def read_chunk(self, i):
+        """(columns, soundings) of chunk i, soundings padded with 0 to the widest frame of the chunk."""
+        if self._cached[0] == i:
+            return self._cached[1]
+        chunk = self.chunks[i]
+        frames = int(chunk["frames"])
+        with open(self.path, 'rb') as f:
+            f.seek(int(chunk["offset"]))
+            column_block = f.read(int(chunk["columns_size"]))
+            sounding_block = f.read(int(chunk["soundings_size"]))
+        stored = _decode_columns(self._decompress(column_block), self.layout, frames)
+        columns = {name: stored[name] if name in stored else _derived_column(name, stored) for name in self.metadata["names"]}
+        soundings = None
+        if self.metadata["soundings"]:
+            soundings = np.frombuffer(self._decompress(sounding_block), dtype=np.uint8).reshape(frames, int(chunk["width"]))
+            soundings = np.cumsum(soundings, axis=1, dtype=np.uint8) if chunk["sounding_delta"] else soundings.copy()
+        self._cached = (i, (columns, soundings))
+        return columns, soundings
+
+    def get_frame(self, i):
+        """Header values of frame i as dict and its sounding payload as bytes (None without soundings)."""
+        if not 0 <= i < len(self):
+            raise IndexError(f"frame {i} out of range ({len(self)} frames)")
+        columns, soundings = self.read_chunk(i // self.metadata["chunk_frames"])
+        row = i % self.metadata["chunk_frames"]
+        record = {name: values[row].item() for name, values in columns.items()}
+        sounding = None if soundings is None else soundings[row, :record["sounding_length"]].tobytes()
+        return record, sounding
+
+    def frames(self, start, stop):
+        """(columns, soundings) of the frames start..stop-1."""
+        chunk_frames = self.metadata["chunk_frames"]
+        start, stop = max(start, 0), min(stop, len(self))
+        first, last = start // chunk_frames, max(stop - 1, start) // chunk_frames
+        parts = [self.read_chunk(i) for i in range(first, last + 1)] if stop > start else []
+        columns, soundings = self._concatenate(parts)
+        cut = slice(start - first * chunk_frames, stop - first * chunk_frames)
+        return {name: values[cut] for name, values in columns.items()}, None if soundings is None else soundings[cut]
+
+    def time_window(self, t0, t1):
+        """(columns, soundings) of all frames with t0 <= time_offset <= t1 (raw milliseconds)."""
+        overlapping = np.flatnonzero((self.chunks["time_max"] >= t0) & (self.chunks["time_min"] <= t1))
+        columns, soundings = self._concatenate([self.read_chunk(int(i)) for i in overlapping])
+        if "time_offset" not in columns:
+            return columns, soundings
+        keep = (columns["time_offset"] >= t0) & (columns["time_offset"] <= t1)
+        return {name: values[keep] for name, values in columns.items()}, None if soundings is None else soundings[keep]
+
+    def _concatenate(self, parts):
+        if not parts:
+            empty = self.read_chunk(0)[0] if len(self.chunks) else {name: np.zeros(0, dtype=dtype) for name, dtype in self.layout}
+            empty = {name: values[:0] for name, values in empty.items()}
+            return empty, np.zeros((0, 0), dtype=np.uint8) if self.metadata["soundings"] else None
+        columns = {name: np.concatenate([part[0][name] for part in parts]) for name in parts[0][0]}
+        if parts[0][1] is None:
+            return columns, None
+        width = max(part[1].shape[1] for part in parts)
+        soundings = np.zeros((len(columns[self.layout[0][0]]), width), dtype=np.uint8)
+        row = 0
+        for _, matrix in parts:
+            soundings[row:row + len(matrix), :matrix.shape[1]] = matrix
+            row += len(matrix)
+        return columns, soundings
+
+
+# Example usage
+# decoder = SL2Decoder('path_to_file.sl2', 'lowFakeConfig.yaml')
+# decoder.save_to_archive('survey.sl2a')
+# archive = SonarArchive('survey.sl2a')
+# record, sounding = archive.get_frame(1000)
@@ -0,0 +1,617 @@
+import argparse
+import asyncio
+import base64
+import json
+import mmap
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from ..lazyImport import LazyModule
+from .batchDecode import collect_sonar_files
+from .echogramTiles import DEFAULT_TILE_SIZE, PALETTES, REDUCTIONS, encode_png, reduce_pairs
+from .lowranceToHumanReadable import FLAG_BITS, SL2Decoder, _derived_value
+
+np = LazyModule("numpy", globals(), "np")
+
+# Routes (GET, JSON unless noted), frames are numbered in file order like in SL2Decoder.load_index/get_frame:
+#   /recordings                                    opened recordings with frame count, channels and time range
+#   /frames?recording=&start=&stop=&t0=&t1=&channel=&fields=&soundings=1&convert=1&limit=
+#                                                  decoded frames as columns; start/stop are frame numbers (stop
+#                                                  exclusive), t0/t1 time_offset in ms (inclusive), both can be combined
+#   /track?recording=&start=&stop=&t0=&t1=&channel=&points=
+#                                                  GeoJSON LineString (WGS84) through at most `points` evenly spaced frames
+#   /echogram?recording=&channel=                  levels of the echogram tile pyramid, like tiles.json
+#   /tiles/<recording>/<channel>/<level>/<x>/<y>.png   echogram tile (PNG), the same pixels as EchogramRenderer
+#   /stats                                         cache statistics
+# Frames rejected by the `filter` of the config are left out everywhere, the tiles count the kept frames of a channel.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_BYTES = 512 * 1024 ** 2
+CHUNK_FRAMES = 4096  # frames decoded and cached together
+MAX_FRAMES = 5000  # frames per /frames response, the response names the frame to continue with
+DEFAULT_TRACK_POINTS = 1000
+MAX_TRACK_POINTS = 100000
+TILE_BATCH_FRAMES = 1 << 12  # frames gathered at a time when a tile is rendered
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Worker functions, they run in the process pool and keep one decoder per file and config.
+
+@lru_cache(maxsize=None)
+def _worker_decoder(filepath, config_path):
+    return SL2Decoder(filepath, config_path, verbose=False)
+
+
+def _open_recording(filepath, config_path):
+    """Frame index of a file (sidecar, built if needed) and the mask of the frames passing the config filter (or None)."""
+    decoder = _worker_decoder(filepath, config_path)
+    index = decoder.load_index()
+    if not decoder.filter_plan or not len(index):
+        return index, None
+    keep = []
+    with open(filepath, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        for frame_headers, _, _ in decoder._iter_frame_headers(mm, int(index["offset"][0]), 1 << 16):
+            keep.append(decoder._filter_keep(frame_headers))
+    finally:
+        mm.close()
+    return index, np.concatenate(keep)
+
+
+def _decode_chunk(filepath, config_path, offsets, soundings):
+    """Header columns of the frames at the given offsets, with soundings=True their sounding matrix and lengths instead."""
+    decoder = _worker_decoder(filepath, config_path)
+    with open(filepath, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    raw = np.frombuffer(mm, dtype=np.uint8)
+    try:
+        frame_headers = decoder._gather_frame_headers(mm, offsets)
+        if not soundings:
+            return decoder._header_columns(frame_headers), None
+        matrix, lengths = decoder._gather_soundings(raw, offsets, frame_headers["block_size"])
+        return {"sounding_length": lengths}, matrix
+    finally:
+        del raw
+        mm.close()
+
+
+def _read_positions(filepath, config_path, offsets):
+    """(longitude, latitude) in WGS84 degrees, PositionValid and time_offset of the frames at the given offsets."""
+    decoder = _worker_decoder(filepath, config_path)
+    with open(filepath, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        frame_headers = decoder._gather_frame_headers(mm, offsets)
+    finally:
+        mm.close()
+    x, y = frame_headers["longitude"], frame_headers["latitude"]
+    valid = ((frame_headers["flags"] >> FLAG_BITS["PositionValid"]) & 1).astype(bool) & ((x != 0) | (y != 0))
+    longitude = np.degrees(x / decoder.POLAR_EARTH_RADIUS)
+    latitude = np.degrees(np.arctan(np.sinh(y / decoder.POLAR_EARTH_RADIUS)))
+    return longitude, latitude, valid, frame_headers["time_offset"].copy()
+
+
+def _sounding_depth(filepath, config_path, offset):
+    """Sounding length of the frame at offset, the depth of level 0 of the echogram of its channel."""
+    columns, _ = _decode_chunk(filepath, config_path, np.array([offset], dtype=np.int64), True)
+    return int(columns["sounding_length"][0])
+
+
+def _render_tile(filepath, config_path, offsets, rows, level, reduction, palette):
+    """PNG tile of the frames at offsets (x) and the level 0 sounding samples in `rows` (y), reduced `level` times.
+
+    The frames are gathered in batches of a multiple of 2 ** level, the pairs of every level then stay inside a batch
+    and the result is the same as that of EchogramRenderer, which reduces level by level.
+    """
+    decoder = _worker_decoder(filepath, config_path)
+    batch_frames = max(TILE_BATCH_FRAMES, 1 << level)
+    parts = []
+    with open(filepath, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    raw = np.frombuffer(mm, dtype=np.uint8)
+    try:
+        for start in range(0, len(offsets), batch_frames):
+            batch = offsets[start:start + batch_frames]
+            soundings, _ = decoder._gather_soundings(raw, batch, decoder._gather_frame_headers(mm, batch)["block_size"])
+            matrix = np.zeros((len(batch), rows.stop - rows.start), dtype=np.uint8)
+            width = max(0, min(soundings.shape[1], rows.stop) - rows.start)
+            matrix[:, :width] = soundings[:, rows.start:rows.start + width]
+            for _ in range(level):
+                matrix = reduce_pairs(reduce_pairs(matrix, 0, reduction), 1, reduction)
+            parts.append(matrix)
+    finally:
+        del raw
+        mm.close()
+    return encode_png(np.concatenate(parts).T, None if PALETTES[palette] is None else PALETTES[palette]())
+
+
+def _nbytes(value):
+    """Approximate memory of a cached value (arrays, bytes and containers of them)."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return getattr(value, "nbytes", 64)
+
+
+class LRUCache:
+    """In-memory cache of decoded chunks, tracks and tiles, the least recently used entries go above max_bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (value, nbytes)
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        nbytes = _nbytes(value)
+        if key in self.entries or nbytes > self.max_bytes:
+            return
+        self.entries[key] = (value, nbytes)
+        self.bytes += nbytes
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+class _Recording:
+    """An opened file: decoder (config, conversions), frame index and the frames kept by the config filter."""
+
+    def __init__(self, name, decoder, index, keep):
+        self.name = name
+        self.decoder = decoder
+        self.index = index
+        self.keep = keep
+        time_offsets = index["time_offset"]
+        self.time_sorted = bool(np.all(time_offsets[1:] >= time_offsets[:-1]))
+        self.channel_frames = {}  # channel code -> kept frame numbers of the channel
+
+    def select(self, start=None, stop=None, t0=None, t1=None, channel=None):
+        """Numbers of the kept frames in [start, stop) with t0 <= time_offset <= t1 (of one channel)."""
+        low = 0 if start is None else max(start, 0)
+        high = len(self.index) if stop is None else min(stop, len(self.index))
+        time_offsets = self.index["time_offset"]
+        if self.time_sorted:
+            if t0 is not None:
+                low = max(low, int(np.searchsorted(time_offsets, t0, side='left')))
+            if t1 is not None:
+                high = min(high, int(np.searchsorted(time_offsets, t1, side='right')))
+        if high <= low:
+            return np.zeros(0, dtype=np.int64)
+        mask = np.ones(high - low, dtype=bool) if self.keep is None else self.keep[low:high].copy()
+        if channel is not None:
+            mask &= self.index["channel"][low:high] == channel
+        if not self.time_sorted:
+            if t0 is not None:
+                mask &= time_offsets[low:high] >= t0
+            if t1 is not None:
+                mask &= time_offsets[low:high] <= t1
+        return low + np.flatnonzero(mask)
+
+    def first_channel(self):
+        """Channel of the first kept frame."""
+        first = self.select(stop=CHUNK_FRAMES)
+        first = first if len(first) else self.select()
+        if not len(first):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no frames in {self.name}")
+        return int(self.index["channel"][first[0]])
+
+    def frames_of_channel(self, channel):
+        if channel not in self.channel_frames:
+            self.channel_frames[channel] = self.select(channel=channel)
+        return self.channel_frames[channel]
+
+    def summary(self):
+        channels, counts = np.unique(self.index["channel"], return_counts=True)
+        time_offsets = self.index["time_offset"]
+        return {
+            "recording": self.name,
+            "path": str(self.decoder.filepath),
+            "frames": len(self.index),
+            "kept_frames": len(self.index) if self.keep is None else int(np.count_nonzero(self.keep)),
+            "channels": {str(code): {"name": _derived_value("channel_name", code), "frames": count}
+                         for code, count in zip(channels.tolist(), counts.tolist())},
+            "time_offset_first": int(time_offsets[0]) if len(time_offsets) else None,
+            "time_offset_last": int(time_offsets[-1]) if len(time_offsets) else None,
+        }
+
+
+class SonarServer:
+    """Local HTTP service (asyncio) for frame ranges, tracks and echogram tiles of SL2 recordings.
+
+    The files are opened once (frame index from the sidecar, see SL2Decoder.load_index). Decoding runs in a process
+    pool, so the event loop only parses requests and assembles responses. Decoded chunks of CHUNK_FRAMES frames,
+    tracks and tiles are kept in an LRU cache of at most cache_bytes; concurrent requests for the same chunk wait for
+    the same decode. Everything runs offline on the local machine.
+
+    server = SonarServer(['survey1.sl2', 'survey2.sl2'], 'lowFakeConfig.yaml')
+    asyncio.run(server.serve('127.0.0.1', 8765))
+    """
+
+    def __init__(self, paths, config_path=None, cache_bytes=DEFAULT_CACHE_BYTES, processes=None,
+                 tile_size=DEFAULT_TILE_SIZE, reduction="max", palette="gray"):
+        if reduction not in REDUCTIONS:
+            raise ValueError(f"Unknown reduction: {reduction} (available: {', '.join(REDUCTIONS)})")
+        if palette not in PALETTES:
+            raise ValueError(f"Unknown palette: {palette} (available: {', '.join(PALETTES)})")
+        if tile_size % 2:
+            raise ValueError("tile_size must be even")
+        self.paths = [Path(path) for path in paths]
+        self.config_path = config_path
+        self.cache = LRUCache(cache_bytes)
+        self.processes = processes
+        self.tile_size = tile_size
+        self.reduction = reduction
+        self.palette = palette
+        self.recordings = {}
+        self.pool = None
+        self.pending = {}  # key -> future of a running decode
+
+    async def open(self):
+        """Starts the process pool and opens all files (index and filter mask are built in the pool)."""
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.processes)
+        loop = asyncio.get_running_loop()
+        opened = await asyncio.gather(*(loop.run_in_executor(self.pool, _open_recording, str(path), self.config_path)
+                                        for path in self.paths))
+        for path, (index, keep) in zip(self.paths, opened):
+            name = path.stem
+            number = 2
+            while name in self.recordings:
+                name = f"{path.stem}-{number}"
+                number += 1
+            self.recordings[name] = _Recording(name, SL2Decoder(str(path), self.config_path, verbose=False), index, keep)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        await self.open()
+        server = await asyncio.start_server(self._handle, host, port)
+        print(f"Serving {len(self.recordings)} recordings on http://{host}:{port}/recordings")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    async def _handle(self, reader, writer):
+        """One connection, HTTP/1.1 with keep-alive."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get("content-length"):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                parts = request_line.decode("latin-1").split()
+                version = parts[2] if len(parts) == 3 else "HTTP/1.0"
+                if len(parts) != 3:
+                    status, content_type, body = self._error(HTTPStatus.BAD_REQUEST, "malformed request line")
+                elif parts[0] not in ("GET", "HEAD"):
+                    status, content_type, body = self._error(HTTPStatus.METHOD_NOT_ALLOWED, "only GET is supported")
+                else:
+                    status, content_type, body = await self._respond(parts[1])
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                    f"Access-Control-Allow-Origin: *\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode("latin-1"))
+                if parts and parts[0] != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, target):
+        """(status, content type, body) of a GET request."""
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        route = [part for part in url.path.split("/") if part]
+        try:
+            if not route or route == ["recordings"]:
+                return self._json([recording.summary() for recording in self.recordings.values()])
+            if route == ["frames"]:
+                return self._json(await self.frames(self._recording(query), **self._frame_query(query)))
+            if route == ["track"]:
+                return self._json(await self.track(self._recording(query), **self._frame_query(query, track=True)))
+            if route == ["echogram"]:
+                recording = self._recording(query)
+                return self._json(await self.echogram(recording, self._channel(recording, query.get("channel"))))
+            if len(route) == 6 and route[0] == "tiles" and route[5].endswith(".png"):
+                recording = self._recording({"recording": route[1]})
+                level, x, y = (self._int(value, "tile") for value in (route[3], route[4], route[5][:-4]))
+                return HTTPStatus.OK, "image/png", await self.tile(recording, self._channel(recording, route[2]), level, x, y)
+            if route == ["stats"]:
+                return self._json({**self.cache.stats(), "pending": len(self.pending)})
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"unknown path: {url.path}")
+        except HTTPError as e:
+            return self._error(e.status, str(e))
+        except ValueError as e:
+            return self._error(HTTPStatus.BAD_REQUEST, str(e))
+        except Exception as e:
+            return self._error(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+
+    def _json(self, data):
+        return HTTPStatus.OK, "application/json", json.dumps(data, separators=(",", ":")).encode()
+
+    def _error(self, status, message):
+        return status, "application/json", json.dumps({"error": message}).encode()
+
+    def _recording(self, query):
+        name = query.get("recording")
+        if name is None and len(self.recordings) == 1:
+            return next(iter(self.recordings.values()))
+        if name not in self.recordings:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"unknown recording: {name}")
+        return self.recordings[name]
+
+    def _channel(self, recording, value):
+        if value is None:
+            return None
+        return recording.decoder._channel_code(int(value) if value.lstrip("-").isdigit() else value)
+
+    def _int(self, value, name):
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an integer, not {value!r}") from None
+
+    def _frame_query(self, query, track=False):
+        """Keyword arguments of frames()/track() from the query string."""
+        def number(name):
+            return None if query.get(name) in (None, "") else self._int(query[name], name)
+
+        selection = {name: number(name) for name in ("start", "stop", "t0", "t1")}
+        selection["channel"] = query.get("channel")
+        if track:
+            selection["points"] = number("points") or DEFAULT_TRACK_POINTS
+            return selection
+        selection["fields"] = query["fields"].split(",") if query.get("fields") else None
+        selection["soundings"] = query.get("soundings") in ("1", "true")
+        selection["convert"] = query.get("convert") in ("1", "true")
+        selection["limit"] = number("limit") or MAX_FRAMES
+        return selection
+
+    async def _cached(self, key, function, *args):
+        """Value from the cache or computed with function(*args) in the process pool; one computation per key at a time."""
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        future = self.pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+            self.pending[key] = future
+            future.add_done_callback(lambda done: self._computed(key, done))
+        return await asyncio.shield(future)  # a closed connection must not cancel the decode of the other requests
+
+    def _computed(self, key, future):
+        del self.pending[key]
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    async def _chunks(self, recording, numbers, soundings):
+        """{chunk number: (columns, soundings)} of the chunks containing the frame numbers."""
+        chunks = np.unique(numbers // CHUNK_FRAMES).tolist()
+        filepath = str(recording.decoder.filepath)
+        decoded = await asyncio.gather(*(
+            self._cached((recording.name, "soundings" if soundings else "headers", chunk), _decode_chunk, filepath,
+                         self.config_path, recording.index["offset"][chunk * CHUNK_FRAMES:(chunk + 1) * CHUNK_FRAMES],
+                         soundings)
+            for chunk in chunks))
+        return dict(zip(chunks, decoded))
+
+    async def frames(self, recording, start=None, stop=None, t0=None, t1=None, channel=None, fields=None,
+                     soundings=False, convert=False, limit=MAX_FRAMES):
+        """Decoded frames of a recording as {"columns": {name: values}, ...}, at most `limit` frames per call."""
+        code = self._channel(recording, channel) if isinstance(channel, str) else channel
+        numbers = recording.select(start, stop, t0, t1, code)
+        limit = max(1, min(limit, MAX_FRAMES))
+        next_frame = int(numbers[limit]) if len(numbers) > limit else None
+        numbers = numbers[:limit]
+        if soundings and not recording.decoder.decode_soundings:
+            raise ValueError("the config does not decode sounding data")
+        header_chunks = await self._chunks(recording, numbers, False)
+        sounding_chunks = await self._chunks(recording, numbers, True) if soundings else None
+        # selecting and serializing a few thousand frames is done in a thread, the event loop keeps serving
+        return await asyncio.to_thread(self._frames_response, recording, numbers, header_chunks, sounding_chunks,
+                                       fields, convert, next_frame)
+
+    def _frames_response(self, recording, numbers, header_chunks, sounding_chunks, fields, convert, next_frame):
+        columns = _take(header_chunks, numbers, 0)
+        columns = {"frame": numbers, **columns}
+        if fields is not None:
+            unknown = [name for name in fields if name not in columns and name != "sounding_length"]
+            if unknown:
+                raise ValueError(f"unknown fields: {unknown}")
+            columns = {name: columns[name] for name in ["frame", *fields] if name in columns}
+        if convert:
+            columns = recording.decoder.convert_columns(columns)
+        response = {"recording": recording.name, "frames": len(numbers), "next": next_frame}
+        if sounding_chunks is not None:
+            lengths = _take(sounding_chunks, numbers, 0)["sounding_length"]
+            matrix = _take(sounding_chunks, numbers, 1)
+            columns["sounding_length"] = lengths
+            response["soundings"] = {"shape": list(matrix.shape), "dtype": "uint8",
+                                     "base64": base64.b64encode(np.ascontiguousarray(matrix)).decode("ascii")}
+        response["columns"] = {name: values.tolist() for name, values in columns.items()}
+        return response
+
+    async def track(self, recording, start=None, stop=None, t0=None, t1=None, channel=None, points=DEFAULT_TRACK_POINTS):
+        """GeoJSON feature with the positions of at most `points` evenly spaced frames of a channel (default: the first)."""
+        code = self._channel(recording, channel) if isinstance(channel, str) else channel
+        if code is None:
+            code = recording.first_channel()  # every channel repeats the position of the boat
+        numbers = recording.select(start, stop, t0, t1, code)
+        points = max(2, min(points, MAX_TRACK_POINTS))
+        if len(numbers) > points:
+            numbers = numbers[np.unique(np.linspace(0, len(numbers) - 1, points).round().astype(np.int64))]
+        key = (recording.name, "track", start, stop, t0, t1, code, points)
+        longitude, latitude, valid, time_offsets = await self._cached(
+            key, _read_positions, str(recording.decoder.filepath), self.config_path, recording.index["offset"][numbers])
+        return {
+            "type": "Feature",
+            "geometry": {"type": "LineString",
+                         "coordinates": np.column_stack([longitude[valid], latitude[valid]]).round(8).tolist()},
+            "properties": {"recording": recording.name, "channel": code, "frame": numbers[valid].tolist(),
+                           "time_offset": time_offsets[valid].tolist()},
+        }
+
+    async def _depth(self, recording, channel):
+        frames = recording.frames_of_channel(channel)
+        if not len(frames):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no frames of channel {channel} in {recording.name}")
+        if not recording.decoder.decode_soundings:
+            raise ValueError("the config does not decode sounding data, the echogram needs it")
+        return await self._cached((recording.name, "depth", channel), _sounding_depth, str(recording.decoder.filepath),
+                                  self.config_path, int(recording.index["offset"][frames[0]]))
+
+    def _levels(self, width, depth):
+        """(width, depth) per level of the pyramid, up to the first level that fits into a single tile."""
+        levels = [(width, depth)]
+        while width > self.tile_size or depth > self.tile_size:
+            width, depth = -(-width // 2), -(-depth // 2)
+            levels.append((width, depth))
+        return levels
+
+    async def echogram(self, recording, channel=None):
+        """Metadata of the echogram tiles of a channel (default: channel of the first kept frame), like tiles.json."""
+        if channel is None:
+            channel = recording.first_channel()
+        frames = recording.frames_of_channel(channel)
+        depth = await self._depth(recording, channel)
+        time_offsets = recording.index["time_offset"][frames]
+        return {
+            "recording": recording.name,
+            "channel": channel,
+            "channel_name": _derived_value("channel_name", channel),
+            "frames": len(frames),
+            "time_offset_first": int(time_offsets[0]),
+            "time_offset_last": int(time_offsets[-1]),
+            "tile_size": self.tile_size,
+            "reduction": self.reduction,
+            "palette": self.palette,
+            "levels": [
+                {"level": number, "width": width, "height": height,
+                 "tiles_x": -(-width // self.tile_size), "tiles_y": -(-height // self.tile_size)}
+                for number, (width, height) in enumerate(self._levels(len(frames), depth))
+            ],
+        }
+
+    async def tile(self, recording, channel, level, x, y):
+        """PNG of tile (x, y) of a level, rendered from the frames of the channel and cached."""
+        if channel is None:
+            raise ValueError("the tile path needs a channel")
+        frames = recording.frames_of_channel(channel)
+        depth = await self._depth(recording, channel)
+        levels = self._levels(len(frames), depth)
+        if not 0 <= level < len(levels):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"level {level} does not exist (0-{len(levels) - 1})")
+        width, height = levels[level]
+        if not (0 <= x < -(-width // self.tile_size) and 0 <= y < -(-height // self.tile_size)):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"tile {x}/{y} does not exist in level {level}")
+        span = self.tile_size << level  # frames and samples of level 0 in one tile
+        offsets = recording.index["offset"][frames[x * span:(x + 1) * span]]
+        rows = range(y * span, min((y + 1) * span, depth))
+        return await self._cached((recording.name, "tile", channel, level, x, y), _render_tile,
+                                  str(recording.decoder.filepath), self.config_path, offsets, rows, level,
+                                  self.reduction, self.palette)
+
+
+def _take(chunks, numbers, part):
+    """Rows of the frame numbers from the decoded chunks: the columns (part 0) or the sounding matrix (part 1)."""
+    selected = []
+    for chunk, decoded in chunks.items():
+        rows = numbers[numbers // CHUNK_FRAMES == chunk] - chunk * CHUNK_FRAMES
+        values = decoded[part]
+        selected.append({name: column[rows] for name, column in values.items()} if part == 0 else values[rows])
+    if part == 0:
+        names = selected[0].keys() if selected else []
+        return {name: np.concatenate([item[name] for item in selected]) for name in names}
+    width = max((matrix.shape[1] for matrix in selected), default=0)
+    matrix = np.zeros((len(numbers), width), dtype=np.uint8)
+    row = 0
+    for item in selected:  # shorter payloads of a chunk are padded with 0, like in to_arrays
+        matrix[row:row + len(item), :item.shape[1]] = item
+        row += len(item)
+    return matrix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP server for frames, tracks and echogram tiles of sonar files.")
+    parser.add_argument("inputs", nargs="+", help="directories, glob patterns (quoted) or files")
+    parser.add_argument("-c", "--config", default=None, help="lowFakeConfig.yaml (default: raw values, all fields)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-mb", type=int, default=DEFAULT_CACHE_BYTES // 1024 ** 2, help="memory cap of the cache")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of decode processes (default: all cores)")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument("--reduction", choices=REDUCTIONS, default="max", help="how tile pixels are combined per level")
+    parser.add_argument("--palette", choices=sorted(PALETTES), default="gray")
+    args = parser.parse_args(argv)
+
+    files = collect_sonar_files(args.inputs)
+    if not files:
+        print("No .sl2/.slg/.sl3 files found.")
+        return 1
+    server = SonarServer(files, args.config, args.cache_mb * 1024 ** 2, args.workers, args.tile_size, args.reduction,
+                         args.palette)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+# Example usage
+# lowfake-serve surveys/ -c lowFakeConfig.yaml --cache-mb 1024
+# curl 'http://127.0.0.1:8765/frames?recording=survey1&t0=60000&t1=120000&fields=water_depth,latitude,longitude'
+# curl 'http://127.0.0.1:8765/track?recording=survey1&points=500'
+# curl -o tile.png 'http://127.0.0.1:8765/tiles/survey1/downscan/0/0/0.png'
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
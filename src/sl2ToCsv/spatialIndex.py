@@ -0,0 +1,256 @@
+import argparse
+import math
+import mmap
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from ..lazyImport import LazyModule
+from .lowranceToHumanReadable import FILE_HEADER_SIZE, FLAG_BITS, SL2Decoder
+
+np = LazyModule("numpy", globals(), "np")
+
+SPATIAL_INDEX_VERSION = 1
+DEFAULT_CELL_SIZE = 200  # grid cell in raw Spherical Mercator units (about 130 m at 50° latitude)
+POLAR_EARTH_RADIUS = 6356752.3142  # same sphere as SL2Decoder.convert_columns
+MAX_LATITUDE = 89.9999
+BATCH_FRAMES = 1 << 16
+RUN_COLUMNS = ("cell_x", "cell_y", "first_frame", "last_frame", "offset", "min_x", "max_x", "min_y", "max_y")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    next_offset INTEGER NOT NULL,
+    indexed TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    file_id INTEGER NOT NULL REFERENCES files (id),
+    cell_x INTEGER NOT NULL,
+    cell_y INTEGER NOT NULL,
+    first_frame INTEGER NOT NULL,
+    last_frame INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    min_x INTEGER NOT NULL,
+    max_x INTEGER NOT NULL,
+    min_y INTEGER NOT NULL,
+    max_y INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_cell ON runs (cell_x, cell_y);
+CREATE INDEX IF NOT EXISTS runs_file ON runs (file_id);
+"""
+
+
+def to_mercator(latitude, longitude):
+    """WGS84 degrees -> raw Spherical Mercator (x, y) as stored in longitude/latitude of the frame headers."""
+    latitude = min(max(latitude, -MAX_LATITUDE), MAX_LATITUDE)  # the poles are at infinity
+    x = POLAR_EARTH_RADIUS * math.radians(longitude)
+    y = POLAR_EARTH_RADIUS * math.log(math.tan(math.pi / 4 + math.radians(latitude) / 2))
+    return x, y
+
+
+def position_runs(frame_headers, offsets, first_frame, cell_size):
+    """Runs of consecutive frames with valid position in the same grid cell.
+
+    Returns the columns cell_x, cell_y, first_frame, last_frame, offset (of the first frame) and the bounding box
+    min_x, max_x, min_y, max_y per run. Frames without PositionValid (or at 0/0) do not belong to any run.
+    """
+    x = frame_headers["longitude"].astype(np.int64)
+    y = frame_headers["latitude"].astype(np.int64)
+    valid = ((frame_headers["flags"] >> FLAG_BITS["PositionValid"]) & 1).astype(bool) & ((x != 0) | (y != 0))
+    rows = np.flatnonzero(valid)
+    x, y = x[rows], y[rows]
+    cell_x, cell_y = x // cell_size, y // cell_size
+    breaks = (cell_x[1:] != cell_x[:-1]) | (cell_y[1:] != cell_y[:-1]) | (rows[1:] != rows[:-1] + 1)
+    starts = np.flatnonzero(np.concatenate(([len(rows) > 0], breaks)))
+    ends = np.append(starts[1:], len(rows)) - 1
+    if not len(starts):
+        return {}
+    return {
+        "cell_x": cell_x[starts],
+        "cell_y": cell_y[starts],
+        "first_frame": first_frame + rows[starts],
+        "last_frame": first_frame + rows[ends],
+        "offset": offsets[rows[starts]],
+        "min_x": np.minimum.reduceat(x, starts),
+        "max_x": np.maximum.reduceat(x, starts),
+        "min_y": np.minimum.reduceat(y, starts),
+        "max_y": np.maximum.reduceat(y, starts),
+    }
+
+
+class SpatialIndex:
+    """Uniform grid over the frame positions of many recordings, kept in one SQLite file.
+
+    Every row maps a grid cell to a run of consecutive frames of one file inside that cell: frame numbers in file
+    order (as in SL2Decoder.load_index/get_frame), byte offset of the first frame and bounding box of the run.
+    Files are added incrementally: unchanged files are skipped, grown files (a recording that is still running) are
+    indexed from the end of the last run on, changed files are indexed again. Queries return frame ranges whose
+    bounding box touches the area, the exact test per frame is done after decoding them.
+
+    index = SpatialIndex('surveys.sqlite')
+    index.add(SL2Decoder('path_to_file.sl2', 'lowFakeConfig.yaml'))
+    for path, first_frame, last_frame, offset in index.bbox(52.50, 13.39, 52.51, 13.41): ...
+    """
+
+    def __init__(self, path, cell_size=None):
+        self.path = Path(path)
+        self.connection = sqlite3.connect(self.path)
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+            if not meta:
+                meta = {"version": str(SPATIAL_INDEX_VERSION), "cell_size": str(cell_size or DEFAULT_CELL_SIZE)}
+                self.connection.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+        if int(meta["version"]) != SPATIAL_INDEX_VERSION:
+            raise ValueError(f"{self.path} has version {meta['version']}, expected {SPATIAL_INDEX_VERSION}")
+        self.cell_size = int(meta["cell_size"])
+        if cell_size is not None and cell_size != self.cell_size:
+            raise ValueError(f"{self.path} uses cell size {self.cell_size}, not {cell_size}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, decoder):
+        """Indexes the file of the decoder (headers only, memory-mapped). Returns the number of new frames."""
+        path = str(Path(decoder.filepath).resolve())
+        stat = os.stat(path)
+        known = self.connection.execute(
+            "SELECT id, size, mtime_ns, frames, next_offset FROM files WHERE path = ?", (path,)).fetchone()
+        if known is not None and (known[1], known[2]) == (stat.st_size, stat.st_mtime_ns):
+            return 0
+        if known is not None and stat.st_size > known[1] and known[4] > FILE_HEADER_SIZE:
+            file_id, frames, pos = known[0], known[3], known[4]  # grown: continue behind the last indexed frame
+        else:
+            file_id, frames, pos = None, 0, FILE_HEADER_SIZE
+
+        runs = []
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            decoder._read_file_header(mm)
+            for frame_headers, offsets, next_pos in decoder._iter_frame_headers(mm, pos, BATCH_FRAMES):
+                batch = position_runs(frame_headers, offsets, frames, self.cell_size)
+                if batch:
+                    runs.append(np.column_stack([batch[name] for name in RUN_COLUMNS]))
+                frames += len(offsets)
+                pos = next_pos
+        finally:
+            mm.close()
+
+        added = frames - (known[3] if file_id is not None else 0)
+        with self.connection:
+            if file_id is None:
+                if known is not None:
+                    self.connection.execute("DELETE FROM runs WHERE file_id = ?", (known[0],))
+                    self.connection.execute("DELETE FROM files WHERE id = ?", (known[0],))
+                file_id = self.connection.execute(
+                    "INSERT INTO files (path, size, mtime_ns, frames, next_offset, indexed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_mtime_ns, frames, pos, datetime.now().isoformat(timespec="seconds"))).lastrowid
+            else:
+                self.connection.execute(
+                    "UPDATE files SET size = ?, mtime_ns = ?, frames = ?, next_offset = ?, indexed = ? WHERE id = ?",
+                    (stat.st_size, stat.st_mtime_ns, frames, pos, datetime.now().isoformat(timespec="seconds"), file_id))
+            for block in runs:
+                self.connection.executemany(
+                    f"INSERT INTO runs (file_id, {', '.join(RUN_COLUMNS)}) VALUES (?{', ?' * len(RUN_COLUMNS)})",
+                    ((file_id, *row) for row in block.tolist()))
+        if decoder.verbose:
+            print(f"Indexed {added} frames of {path} ({sum(len(block) for block in runs)} runs)")
+        return added
+
+    def remove(self, path):
+        """Removes a file and its runs from the index."""
+        path = str(Path(path).resolve())
+        with self.connection:
+            for (file_id,) in self.connection.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchall():
+                self.connection.execute("DELETE FROM runs WHERE file_id = ?", (file_id,))
+                self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def files(self):
+        """(path, frames, indexed) of all indexed files."""
+        return self.connection.execute("SELECT path, frames, indexed FROM files ORDER BY path").fetchall()
+
+    def bbox(self, min_latitude, min_longitude, max_latitude, max_longitude):
+        """Frame ranges (path, first_frame, last_frame, offset) with positions that may lie inside the box (WGS84)."""
+        min_x, min_y = to_mercator(min_latitude, min_longitude)
+        max_x, max_y = to_mercator(max_latitude, max_longitude)
+        return _merge_ranges(row[:4] for row in self._query(min_x, min_y, max_x, max_y))
+
+    def radius(self, latitude, longitude, meters):
+        """Frame ranges (path, first_frame, last_frame, offset) with positions that may lie within `meters` of the point.
+
+        The distance is measured in Mercator units scaled at the latitude of the point, exact for survey sized radii.
+        """
+        center_x, center_y = to_mercator(latitude, longitude)
+        reach = meters / math.cos(math.radians(latitude))
+        ranges = []
+        for path, first_frame, last_frame, offset, min_x, max_x, min_y, max_y in self._query(
+                center_x - reach, center_y - reach, center_x + reach, center_y + reach):
+            dx = max(min_x - center_x, 0, center_x - max_x)
+            dy = max(min_y - center_y, 0, center_y - max_y)
+            if dx * dx + dy * dy <= reach * reach:
+                ranges.append((path, first_frame, last_frame, offset))
+        return _merge_ranges(ranges)
+
+    def _query(self, min_x, min_y, max_x, max_y):
+        cell = self.cell_size
+        return self.connection.execute(
+            "SELECT files.path, first_frame, last_frame, offset, min_x, max_x, min_y, max_y FROM runs "
+            "JOIN files ON files.id = runs.file_id "
+            "WHERE cell_x BETWEEN ? AND ? AND cell_y BETWEEN ? AND ? "
+            "AND max_x >= ? AND min_x <= ? AND max_y >= ? AND min_y <= ?",
+            (math.floor(min_x / cell), math.floor(max_x / cell), math.floor(min_y / cell), math.floor(max_y / cell),
+             min_x, max_x, min_y, max_y)).fetchall()
+
+
+def _merge_ranges(ranges):
+    """Sorts the frame ranges by file and frame and joins overlapping or adjacent ones."""
+    merged = []
+    for path, first_frame, last_frame, offset in sorted(ranges):
+        if merged and merged[-1][0] == path and first_frame <= merged[-1][2] + 1:
+            merged[-1][2] = max(merged[-1][2], last_frame)
+        else:
+            merged.append([path, first_frame, last_frame, offset])
+    return [tuple(item) for item in merged]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spatial grid index over the frame positions of many sonar files.")
+    parser.add_argument("database", help="SQLite file of the index")
+    parser.add_argument("--add", nargs="+", default=[], help="sonar files to add or update")
+    parser.add_argument("-c", "--config", default=None, help="lowFakeConfig.yaml (default: raw values, all fields)")
+    parser.add_argument("--cell-size", type=int, default=None, help=f"grid cell in Mercator units (new index: {DEFAULT_CELL_SIZE})")
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"))
+    parser.add_argument("--radius", nargs=3, type=float, metavar=("LAT", "LON", "METERS"))
+    args = parser.parse_args(argv)
+
+    with SpatialIndex(args.database, args.cell_size) as index:
+        for path in args.add:
+            index.add(SL2Decoder(path, args.config))
+        ranges = index.bbox(*args.bbox) if args.bbox else index.radius(*args.radius) if args.radius else []
+        for path, first_frame, last_frame, offset in ranges:
+            print(f"{path}\t{first_frame}\t{last_frame}\t{offset}")
+    return 0
+
+
+# Example usage
+# index = SpatialIndex('surveys.sqlite')
+# for path in ('survey1.sl2', 'survey2.sl2'):
+#     index.add(SL2Decoder(path, 'lowFakeConfig.yaml'))
+# ranges = index.radius(52.505, 13.40, 50)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
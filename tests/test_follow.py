@@ -0,0 +1,24 @@
+from lowfake.benchmarks.syntheticSl2 import generate_sl2
+from lowfake.sl2ToCsv.lowranceToHumanReadable import SL2Decoder
+
+
+def test_follow_writes_all_frames_of_a_finished_recording(tmp_path):
+    sl2_path = tmp_path / "finished.sl2"
+    generate_sl2(sl2_path, frames=300)
+
+    decoder = SL2Decoder(sl2_path, verbose=False)
+    decoder.decode()
+    decoder.save_to_csv(tmp_path / "decoded.csv")
+
+    follower = SL2Decoder(sl2_path, verbose=False)
+    follower.follow(tmp_path / "followed.csv", poll_interval=0, idle_timeout=0)
+
+    assert follower.follow_frames == len(decoder.records) == 300
+    assert (tmp_path / "followed.csv").read_bytes() == (tmp_path / "decoded.csv").read_bytes()
+
+
+def test_decode_new_frames_final_includes_the_last_frame(tmp_path):
+    sl2_path = tmp_path / "finished.sl2"
+    generate_sl2(sl2_path, frames=300)
+
+    assert len(SL2Decoder(sl2_path, verbose=False).decode_new_frames(final=True)) == 300